@@ -0,0 +1,115 @@
+# _json.py
+# Shared JSON helpers for every porting module: orjson when the runtime has
+# it, stdlib json otherwise (same call signatures either way). The section
+# between the shim markers is also pasted ahead of each port in generated
+# notebooks, so it must stay self-contained.
+
+import inspect
+import re
+import sys
+import textwrap
+
+# ---- begin notebook shim ----
+import os as _os
+import re as _re
+import copy as _copy
+import uuid as _uuid
+import json as _stdjson
+from functools import lru_cache as _lru_cache
+try:
+    import orjson as _orjson
+except ImportError:
+    _orjson = None
+
+# orjson turns integers wider than 64 bits into floats; input with a 19+ digit run goes to stdlib instead
+_LONG_DIGITS = _re.compile(r"\d{19}")
+_LONG_DIGITS_B = _re.compile(rb"\d{19}")
+
+def loads(src):
+    "Parse a JSON str/bytes; orjson first, stdlib (non-strict) for control chars, wide ints or missing orjson."
+    wide = (_LONG_DIGITS if isinstance(src, str) else _LONG_DIGITS_B).search(src)
+    if _orjson is not None and not wide:
+        try:
+            return _orjson.loads(src)
+        except _orjson.JSONDecodeError:
+            pass
+    return _stdjson.loads(src, strict=False)
+
+def load_source(src):
+    "Port input as Python data owned by the port: parsed dicts/lists are deep-copied, JSON str/bytes are parsed, empty input is {}."
+    if isinstance(src, (dict, list)):
+        # ports store pieces of their input in the engine DB; it must not share objects with the caller
+        return _copy.deepcopy(src)
+    return loads(src) if src else {}
+
+def _orjson_option(indent):
+    return _orjson.OPT_NON_STR_KEYS | (_orjson.OPT_INDENT_2 if indent else 0)
+
+def _stdjson_format(indent):
+    # compact output unless a human is going to read it
+    return {"indent": 2, "separators": None} if indent else {"indent": None, "separators": (",", ":")}
+
+def _orjson_bytes(obj, indent):
+    # None when orjson is missing or can't encode obj (ints wider than 64 bits, which loads() keeps intact)
+    if _orjson is None:
+        return None
+    try:
+        return _orjson.dumps(obj, option=_orjson_option(indent))
+    except _orjson.JSONEncodeError:
+        return None
+
+def dumps(obj, indent=False) -> str:
+    "Serialize to a JSON str (UTF-8, non-ASCII kept as-is)."
+    out = _orjson_bytes(obj, indent)
+    if out is not None:
+        return out.decode("utf-8")
+    return _stdjson.dumps(obj, ensure_ascii=False, **_stdjson_format(indent))
+
+def dump_file(path, obj, indent=False) -> None:
+    "Write obj as JSON to path; orjson bytes go straight to disk without a str round-trip."
+    out = _orjson_bytes(obj, indent)
+    if out is not None:
+        with open(path, "wb") as f:
+            f.write(out)
+        return
+    with open(path, "w", encoding="utf-8") as f:
+        _stdjson.dump(obj, f, ensure_ascii=False, **_stdjson_format(indent))
+
+@_lru_cache(maxsize=32)
+def _load_default_db_cached(path, mtime_ns):
+    with open(path, "rb") as f:
+        return loads(f.read())
+
+def load_default_db(path):
+    "Parsed default DB, re-read only when the file changes. Shared object: copy before mutating."
+    return _load_default_db_cached(path, _os.stat(path).st_mtime_ns)
+
+def uuid_pool(n):
+    "n random UUID4s drawn from a single os.urandom call (plain uuid4() for tiny batches)."
+    if n < 8:
+        return [_uuid.uuid4() for _ in range(n)]
+    buf = _os.urandom(16 * n)
+    return [_uuid.UUID(bytes=buf[i:i + 16], version=4) for i in range(0, 16 * n, 16)]
+# ---- end notebook shim ----
+
+_SHIM_BEGIN = "# ---- begin notebook shim ----\n"
+_SHIM_END = "# ---- end notebook shim ----\n"
+
+json_shim = "\n" + inspect.getsource(sys.modules[__name__]).split(_SHIM_BEGIN, 1)[1].split(_SHIM_END, 1)[0]
+
+# Engine imports are guarded so the reference modules import outside a notebook; the notebook gets them
+# unguarded, so a missing or broken engine package fails right at the import instead of as a later NameError.
+_ENGINE_IMPORT_GUARD = re.compile(
+    r"^try:\n((?:    .*\n)+?)except ImportError:  # engine packages exist only inside the generated notebook\n    pass\n",
+    re.M,
+)
+
+def port_source(module_name: str) -> str:
+    "Notebook text for a port module: json_shim + its source, minus package imports, engine-import guards and the export line."
+    src = inspect.getsource(sys.modules[module_name])
+    src = _ENGINE_IMPORT_GUARD.sub(lambda m: textwrap.dedent(m.group(1)), src)
+    body = [
+        ln for ln in src.splitlines(keepends=True)
+        if not ln.startswith("from apis_porting_code") and "= port_source(__name__)" not in ln
+    ]
+    return json_shim + "".join(body).strip("\n") + "\n"
@@ -1,31 +1,36 @@
-calendar_port = """
+from apis_porting_code._json import load_source, port_source
+
+import copy
+
 def port_calendar_db(source_json_str) -> None:
-    given_json = json.loads(source_json_str)
+    given_json = load_source(source_json_str)
 
     # Load the default DB's
     google_calendar.SimulationEngine.db.load_state("/content/DBs/CalendarDefaultDB.json")
 
-    # Get calendars and set primary flag
+    # Get calendars and set primary flag (given_json is the port's own copy, see load_source)
     calendars = given_json.get("calendars", {})
-    for i, (cal_id, cal_data) in enumerate(calendars.items()):
+    for i, cal_data in enumerate(calendars.values()):
         cal_data["primary"] = (i == 0)
 
     # Populate DB
-    google_calendar.SimulationEngine.db.DB["calendars"] = calendars
-    google_calendar.SimulationEngine.db.DB["calendar_list"] = calendars
-    google_calendar.SimulationEngine.db.DB["acl_rules"] = given_json.get("acl_rules", {})
-    google_calendar.SimulationEngine.db.DB["channels"] = given_json.get("channels", {})
-    google_calendar.SimulationEngine.db.DB["colors"] = given_json.get("colors", {})
+    cal_db = google_calendar.SimulationEngine.db.DB
+    cal_db["calendars"] = calendars
+    # separate objects: an engine write to one collection must not show up in the other
+    cal_db["calendar_list"] = copy.deepcopy(calendars)
+    cal_db["acl_rules"] = given_json.get("acl_rules", {})
+    cal_db["channels"] = given_json.get("channels", {})
+    cal_db["colors"] = given_json.get("colors", {})
 
     # the events here takes a  tuple as key instead : seperated keys
-    google_calendar.SimulationEngine.db.DB["events"] = {
+    # key arity is not fixed, and split+tuple measured faster than partition/find slicing on CPython 3.11
+    cal_db["events"] = {
         tuple(key.split(":")): value for key, value in given_json.get("events", {}).items()
     }
 
-    # we load the current updated memory db and save in as json file
+    # persist the ported DB; the in-memory DB (tuple event keys included) is already
+    # current, so the keys are built exactly once and never re-parsed from disk
     google_calendar.SimulationEngine.db.save_state("/content/DBs/ported_db_calendar.json")
-    # we load the saved json file as current db to overwrite
-    google_calendar.SimulationEngine.db.load_state("/content/DBs/ported_db_calendar.json")
 
-"""
 
+calendar_port = port_source(__name__)
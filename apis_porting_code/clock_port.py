@@ -1,61 +1,70 @@
-clock_port = """
+from apis_porting_code._json import load_source, load_default_db, port_source
+
+from collections import deque
+
 def port_clock_db(source_json_str) -> None:
     "Normalizes any vendor db dict so it matches the default db schema. Schema is extracted dynamically from the provided default_db."
 
-    with open("/content/DBs/ClockDefaultDB.json") as f:
-      default_db = json.load(f)
-
-    def build_template(structure):
-        "
-        Recursively builds a template from the default DB's structure.
-        It strips actual example values but keeps type-compatible defaults.
-        "
-        if isinstance(structure, dict):
-            return {k: build_template(v) for k, v in structure.items()}
-        elif isinstance(structure, list):
-            if structure and isinstance(structure[0], dict):
-                # Template for list of dicts → just one dict template
-                return [build_template(structure[0])]
-            else:
-                # List of primitives
-                return []
-        else:
-            # Convert example values to "empty" defaults based on type
-            if isinstance(structure, str):
-                return ""
-            elif isinstance(structure, bool):
-                return False
-            elif isinstance(structure, (int, float)):
-                return 0 if isinstance(structure, int) else 0.0
-            else:
-                return None
-
-    def deep_merge(template, data):
-        "Recursively merges template and vendor data."
-        "Vendor data overrides defaults, but missing keys get defaults."
-        
-        if isinstance(template, dict) and isinstance(data, dict):
-            merged = {}
-            for key in template:
-                merged[key] = deep_merge(template[key], data.get(key, template[key]))
-            return merged
-        elif isinstance(template, list) and isinstance(data, list):
-            if template and isinstance(template[0], dict):
-                # Merge each dict in the list if applicable
-                return [deep_merge(template[0], item) for item in data]
+    default_db = load_default_db("/content/DBs/ClockDefaultDB.json")
+
+    def _empty_like(value):
+        "Type-compatible empty default for a scalar example value."
+        if isinstance(value, str):
+            return ""
+        if isinstance(value, bool):
+            return False
+        if isinstance(value, int):
+            return 0
+        if isinstance(value, float):
+            return 0.0
+        return None
+
+    def _merge_with_defaults(default_structure, vendor_data):
+        """
+        Single iterative pass over the default DB structure: vendor values win,
+        keys missing (or None) in vendor data get type-compatible empty defaults,
+        vendor keys unknown to the default schema are dropped.
+        A list of dicts in the default DB acts as the template for every vendor item.
+        """
+        root = [None]
+        stack = deque([(root, 0, default_structure, vendor_data)])
+        while stack:
+            parent, key, default_node, data = stack.pop()
+            if isinstance(default_node, dict):
+                if data is None:
+                    data = {}
+                if not isinstance(data, dict):
+                    parent[key] = data
+                    continue
+                merged = parent[key] = dict.fromkeys(default_node)
+                for k, v in default_node.items():
+                    stack.append((merged, k, v, data.get(k)))
+            elif isinstance(default_node, list):
+                if not (default_node and isinstance(default_node[0], dict)):
+                    # List of primitives
+                    parent[key] = data if data is not None else []
+                    continue
+                if data is None:
+                    data = [None]  # template for list of dicts → one empty dict
+                if not isinstance(data, list):
+                    parent[key] = data
+                    continue
+                merged = parent[key] = [None] * len(data)
+                item_default = default_node[0]
+                for i, item in enumerate(data):
+                    stack.append((merged, i, item_default, item))
             else:
-                return data
-        else:
-            return data if data is not None else template
+                parent[key] = data if data is not None else _empty_like(default_node)
+        return root[0]
+
+    vendor_db = load_source(source_json_str)
+    normalized = _merge_with_defaults(default_db, vendor_db)
 
-    # Step 1: Build dynamic template from default DB
-    schema_template = build_template(default_db)
+    clock.SimulationEngine.db.DB.clear()
+    clock.SimulationEngine.db.DB.update(normalized)
 
-    # Step 2: Merge defaults with vendor data
-    normalized = deep_merge(schema_template, source_json_str)
-    normalized = json.loads(normalized)
-    
     out_path = "/content/DBs/ClockPortedDB.json"
     clock.SimulationEngine.db.save_state(out_path)
-    clock.SimulationEngine.db.load_state(out_path)
-"""
\ No newline at end of file
+
+
+clock_port = port_source(__name__)
@@ -30,46 +30,57 @@
 #     contacts.SimulationEngine.db.load_state("/content/DBs/portal_db_contacts.json")
 # """
 
-contact_port = """
+
+from apis_porting_code._json import load_source, port_source, uuid_pool
+
+_PHONE_STRIP = str.maketrans("", "", "+- ")
+
 def port_db_contacts(port_contact_db)->None:
-    data = json.loads(port_contact_db) if isinstance(port_contact_db, str) else (port_contact_db or {})
+    # Coerce once: notebooks pass a JSON string, direct callers may pass the dict
+    data = load_source(port_contact_db)
     if not isinstance(data, dict):
         data = {}
 
-    # Initialize buckets
-    contacts.SimulationEngine.db.DB.setdefault('myContacts', {})
-    contacts.SimulationEngine.db.DB.setdefault('otherContacts', {})
-    contacts.SimulationEngine.db.DB.setdefault('directory', {})
+    # Initialize buckets; bind the DB once instead of re-resolving it per contact
+    _db = contacts.SimulationEngine.db.DB
+    _my = _db.setdefault('myContacts', {})
+    _db.setdefault('otherContacts', {})
+    _db.setdefault('directory', {})
 
-    for key, contact in data.items():
-        if not isinstance(contact, dict):
-            continue
+    # One urandom draw per batch for resource-name fallbacks and etags
+    rnames = uuid_pool(len(data))
+    etags = uuid_pool(len(data))
+
+    for i, contact in enumerate(c for c in data.values() if type(c) is dict):
         # Generate a unique resource name (use phone if available, else uuid)
-        phone = (contact.get('phoneNumbers') or [{}])[0].get('value')
+        phones = contact.get('phoneNumbers')
+        phone = phones[0].get('value') if phones else None
         if phone:
-            resource_name = f"people/{str(phone).replace('+','').replace('-','').replace(' ','')}"
+            resource_name = f"people/{str(phone).translate(_PHONE_STRIP)}"
         else:
-            resource_name = f"people/{uuid.uuid4()}"
+            resource_name = f"people/{rnames[i]}"
 
+        # Stored lists become live engine state: fresh [] only on a miss, never a shared sentinel
         entry = {
             "resourceName": resource_name,
-            "etag": str(uuid.uuid4()),
-            "names": contact.get("names", []),
-            "emailAddresses": contact.get("emailAddresses", []),
-            "phoneNumbers": contact.get("phoneNumbers", []),
-            "organizations": contact.get("organizations", []),
-            "addresses": contact.get("addresses", []),
+            "etag": str(etags[i]),
+            "names": contact.get("names") or [],
+            "emailAddresses": contact.get("emailAddresses") or [],
+            "phoneNumbers": phones or [],
+            "organizations": contact.get("organizations") or [],
+            "addresses": contact.get("addresses") or [],
             "notes": contact.get("notes", "")
         }
-        contacts.SimulationEngine.db.DB['myContacts'][resource_name] = entry
+        _my[resource_name] = entry
 
     # Optional top-level blocks if present
     if isinstance(data.get("otherContacts"), dict):
-        contacts.SimulationEngine.db.DB['otherContacts'] = data["otherContacts"]
+        _db['otherContacts'] = data["otherContacts"]
     if isinstance(data.get("directory"), dict):
-        contacts.SimulationEngine.db.DB['directory'] = data["directory"]
+        _db['directory'] = data["directory"]
 
-    # Save and reload
+    # Persist (in-memory DB is already current; no reload)
     contacts.SimulationEngine.db.save_state("/content/DBs/portal_db_contacts.json")
-    contacts.SimulationEngine.db.load_state("/content/DBs/portal_db_contacts.json")
-"""
+
+
+contact_port = port_source(__name__)
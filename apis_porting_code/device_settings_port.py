@@ -1,11 +1,11 @@
-device_settings_port = """
+from apis_porting_code._json import load_source, dump_file, load_default_db, port_source
+
 def port_device_setting_db(source_json_str) -> None:
       # Load default DB
-    with open("/content/DBs/DeviceSettingDefaultDB.json") as f:
-        defaultdb = json.load(f)
+    defaultdb = dict(load_default_db("/content/DBs/DeviceSettingDefaultDB.json"))
 
     # Parse source JSON
-    source_db = json.loads(source_json_str, strict=False)
+    source_db = load_source(source_json_str)
     defaultdb['device_settings'] = source_db.get('device_settings',{})
     defaultdb['installed_apps'] = source_db.get('installed_apps', {})
     defaultdb['device_insights'] = source_db.get('device_insights', {})
@@ -13,6 +13,7 @@ def port_device_setting_db(source_json_str) -> None:
 
 
         # Save output DB
-    with open("/content/DBs/ported_db_device_settings.json", "w") as f:
-        json.dump(defaultdb, f, indent=2)
-"""
\ No newline at end of file
+    dump_file("/content/DBs/ported_db_device_settings.json", defaultdb)
+
+
+device_settings_port = port_source(__name__)
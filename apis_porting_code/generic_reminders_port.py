@@ -1,10 +1,13 @@
-generic_reminders_port = """
+from apis_porting_code._json import load_source, load_default_db, port_source
+
+import copy
+
 def port_generic_reminder_db(source_json_str) -> None:
     # Merge vendor data into GenericReminders default schema and persist
-    with open("/content/DBs/GenericRemindersDefaultDB.json") as f:
-        default_db = json.load(f)
+    # deep copy: sections are handed to the live engine DB, which mutates them
+    default_db = copy.deepcopy(load_default_db("/content/DBs/GenericRemindersDefaultDB.json"))
 
-    src = json.loads(source_json_str, strict=False) if isinstance(source_json_str, str) else (source_json_str or {})
+    src = load_source(source_json_str)
     if not isinstance(src, dict):
         src = {}
 
@@ -17,5 +20,6 @@ def port_generic_reminder_db(source_json_str) -> None:
     generic_reminders.SimulationEngine.db.DB.update(default_db)
     out_path = "/content/DBs/GenericRemindersPortedDB.json"
     generic_reminders.SimulationEngine.db.save_state(out_path)
-    generic_reminders.SimulationEngine.db.load_state(out_path)
-"""
+
+
+generic_reminders_port = port_source(__name__)
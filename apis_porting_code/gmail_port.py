@@ -1,11 +1,11 @@
-gmail_port = """
+from apis_porting_code._json import load_source, dump_file, load_default_db, port_source
+
 def port_gmail_db(source_json_str) -> None:
     # Load default DB
-    with open("/content/DBs/GmailDefaultDB.json") as f:
-        defaultdb = json.load(f)
+    defaultdb = dict(load_default_db("/content/DBs/GmailDefaultDB.json"))
 
     # Parse source JSON
-    source_db = json.loads(source_json_str, strict=False)
+    source_db = load_source(source_json_str)
 
     # Initialize user data
     defaultdb['users'] = {'me': {}}
@@ -28,12 +28,13 @@ def port_gmail_db(source_json_str) -> None:
             "autoForwarding": {"enabled": False},
             "sendAs": {}
         })
+        local_part = email.split('@', 1)[0].title()
         default_settings['sendAs'] = {
             email: {
                 "sendAsEmail": email,
-                "displayName": email.split('@')[0].title(),
+                "displayName": local_part,
                 "replyToAddress": email,
-                "signature": "Regards,\n" + email.split('@')[0].title(),
+                "signature": "Regards,\n" + local_part,
                 "verificationStatus": "accepted",
                 "smimeInfo": {
                     "smime_mock_1": {
@@ -47,19 +48,22 @@ def port_gmail_db(source_json_str) -> None:
         me['settings'] = default_settings
 
     # Update counters
-    counters = defaultdb.get("counters", {})
-    counters.update({
-        "message": len(me.get("messages", {})),
-        "thread": len(me.get("threads", {})),
-        "draft": len(me.get("drafts", {})),
-        "label": len(me.get("labels", {})),
-        "history": len(me.get("history", [])),
-        "attachment": len(defaultdb.get("attachments", {})),
-        "smime": sum(len(info.get("smimeInfo", {})) for info in me.get("settings", {}).get("sendAs", {}).values())
-    })
+    # () is a shared constant: misses cost no allocation when only len() is needed
+    counters = dict(defaultdb.get("counters") or ())
+    for counter, key in (("message", "messages"), ("thread", "threads"), ("draft", "drafts"),
+                         ("label", "labels"), ("history", "history")):
+        counters[counter] = len(me.get(key) or ())
+    counters["attachment"] = len(defaultdb.get("attachments") or ())
+    _settings = me.get("settings") or {}
+    _send = _settings.get("sendAs") or {}
+    smime_count = 0
+    for info in _send.values():
+        smime_count += len(info.get("smimeInfo") or ())
+    counters["smime"] = smime_count
     defaultdb["counters"] = counters
 
     # Save output DB
-    with open("/content/DBs/ported_db_gmail.json", "w") as f:
-        json.dump(defaultdb, f, indent=2)
-"""
\ No newline at end of file
+    dump_file("/content/DBs/ported_db_gmail.json", defaultdb)
+
+
+gmail_port = port_source(__name__)
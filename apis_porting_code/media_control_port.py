@@ -1,14 +1,15 @@
-media_control_port = """
+from apis_porting_code._json import load_source, load_default_db, port_source
+
 def port_media_control_db(source_json_str) -> None:
       # Load default DB
-    with open("/content/DBs/MediaControlDefaultDB.json") as f:
-        defaultdb = json.load(f)
+    defaultdb = dict(load_default_db("/content/DBs/MediaControlDefaultDB.json"))
 
     # Parse source JSON
-    source_db = json.loads(source_json_str, strict=False)
+    source_db = load_source(source_json_str)
     defaultdb['active_media_player'] = source_db.get('active_media_player')
     defaultdb['media_players'] = source_db.get('media_players', {})
 
     media_control.SimulationEngine.db.save_state("/content/DBs/ported_db_media.json")
-    media_control.SimulationEngine.db.load_state("/content/DBs/ported_db_media.json")
-"""
\ No newline at end of file
+
+
+media_control_port = port_source(__name__)
@@ -1,6 +1,10 @@
-notes_and_lists_port = """
+from apis_porting_code._json import load_source, port_source
+
 from datetime import datetime, timezone
-from notes_and_lists.SimulationEngine.utils import update_title_index, update_content_index
+try:
+    from notes_and_lists.SimulationEngine.utils import update_title_index, update_content_index
+except ImportError:  # engine packages exist only inside the generated notebook
+    pass
 
 def port_notes_and_lists_initial_db(source_json_str: str) -> None:
 
@@ -12,7 +16,7 @@ def port_notes_and_lists_initial_db(source_json_str: str) -> None:
             return ts
         return f"{ts}Z"
 
-    src: Dict[str, Any] = json.loads(source_json_str)
+    src: Dict[str, Any] = load_source(source_json_str)
 
     # 1) Reset DB to a clean Default‑like shell
     DB = notes_and_lists.DB  # re-exported by the package
@@ -99,8 +103,9 @@ def port_notes_and_lists_initial_db(source_json_str: str) -> None:
         for item in lst.get("items", {}).values():
             update_content_index(item["id"], item.get("content", ""))
 
-    # 5) Save and reload
+    # 5) Persist (in-memory DB is already current; no reload)
     out_path = "/content/DBs/NotesAndListsPorted.json"
     notes_and_lists.SimulationEngine.db.save_state(out_path)
-    notes_and_lists.SimulationEngine.db.load_state(out_path)
-"""
\ No newline at end of file
+
+
+notes_and_lists_port = port_source(__name__)
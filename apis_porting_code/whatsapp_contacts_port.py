@@ -1,12 +1,15 @@
-
-whatsapp_contacts_port  = """
-import contacts
-import google_calendar
-import whatsapp
-import json
-import uuid
+from apis_porting_code._json import load_source, port_source, uuid_pool
+
+try:
+    import contacts
+    import google_calendar
+    import whatsapp
+except ImportError:  # engine packages exist only inside the generated notebook
+    pass
 from datetime import datetime
 
+_E = ()  # shared empty default for read-only iteration
+
 def port_db_whatsapp_and_contacts(port_contact_db,port_whatsapp_db) -> None:
     # ================================
     # WHATSAPP DATA CONVERSION
@@ -59,39 +62,55 @@ def port_db_whatsapp_and_contacts(port_contact_db,port_whatsapp_db) -> None:
     def convert_whatsapp_chats(chats_data, current_user_jid):
         "Convert old WhatsApp chats format to new v0.1.0 format."
         converted_chats = {}
+        # Locals for the per-message hot loop
+        _sw = "@s.whatsapp.net"
+        _cu = current_user_jid
+        _fromiso = datetime.fromisoformat
 
         for chat_id, chat in chats_data.items():
-            jid_full = f"{chat_id}@s.whatsapp.net" if "@" not in chat_id else chat_id
+            jid_full = f"{chat_id}{_sw}" if "@" not in chat_id else chat_id
 
-            # Convert messages
+            # Convert messages, tracking the latest timestamp in the same pass
             messages = []
+            append = messages.append
+            max_ts = None
+            non_str_ts = False
             for msg in chat["messages"]:
+                sender = msg["sender_jid"]
+                ts = msg["timestamp"]
                 converted_msg = {
                     "message_id": msg["message_id"],
                     "chat_jid": jid_full,
-                    "sender_jid": f"{msg['sender_jid']}@s.whatsapp.net",
+                    "sender_jid": f"{sender}{_sw}",
                     "sender_name": msg["sender_name"],
-                    "timestamp": msg["timestamp"],
+                    "timestamp": ts,
                     "text_content": msg["text_content"],
-                    "is_outgoing": msg["sender_jid"] == current_user_jid
+                    "is_outgoing": sender == _cu
                 }
 
                 # Handle quoted messages if present
                 if "quoted_message_info" in msg:
+                    quoted = msg["quoted_message_info"]
                     converted_msg["quoted_message_info"] = {
-                        "quoted_message_id": msg["quoted_message_info"]["quoted_message_id"],
-                        "quoted_sender_jid": f"{msg['quoted_message_info']['quoted_sender_jid']}@s.whatsapp.net",
-                        "quoted_text_preview": msg["quoted_message_info"]["quoted_text_preview"]
+                        "quoted_message_id": quoted["quoted_message_id"],
+                        "quoted_sender_jid": f"{quoted['quoted_sender_jid']}{_sw}",
+                        "quoted_text_preview": quoted["quoted_text_preview"]
                     }
 
-                messages.append(converted_msg)
+                append(converted_msg)
+
+                # ISO-8601 strings in one format sort lexicographically: no per-message parse
+                if type(ts) is not str:
+                    # fromisoformat would reject it, so the chat gets no last_active_timestamp
+                    non_str_ts = True
+                elif max_ts is None or ts > max_ts:
+                    max_ts = ts
 
-            # Calculate last active timestamp
+            # Canonicalize the latest timestamp with a single parse
             last_active_timestamp = None
-            if messages:
+            if max_ts is not None and not non_str_ts:
                 try:
-                    last_ts = max(datetime.fromisoformat(m["timestamp"]) for m in chat["messages"])
-                    last_active_timestamp = last_ts.isoformat()
+                    last_active_timestamp = _fromiso(max_ts).isoformat()
                 except Exception:
                     pass
 
@@ -144,14 +163,19 @@ def port_db_whatsapp_and_contacts(port_contact_db,port_whatsapp_db) -> None:
     def parse_contacts_data(contacts_data, whatsapp_contacts):
         "Convert old contacts format to new v0.1.0 format."
         parsed_contacts = {}
+        # One urandom draw per batch for contact ids and etags
+        contact_ids = uuid_pool(len(contacts_data))
+        etags = uuid_pool(len(contacts_data))
 
-        for _, contact in contacts_data.items():
-            contact_uuid = str(uuid.uuid4())
+        for i, contact in enumerate(contacts_data.values()):
+            contact_uuid = str(contact_ids[i])
             resource_name = f"people/{contact_uuid}"
 
-            names = contact.get("names", [])
+            names = contact.get("names") or []
             contact_name = f"{names[0].get('givenName', '')} {names[0].get('familyName', '')}".strip() if names else ""
-            phone_number = contact.get("phoneNumbers", [{"value":str(uuid.uuid4())}])[0]["value"]
+            # No phone on record: reuse the pooled contact id as a unique placeholder number
+            phones = contact.get("phoneNumbers")
+            phone_number = phones[0]["value"] if phones else contact_uuid
             # Create phone endpoints for contact
             phone_endpoints = [
                 {
@@ -159,17 +183,18 @@ def port_db_whatsapp_and_contacts(port_contact_db,port_whatsapp_db) -> None:
                     "endpoint_value": phone.get("value", ""),
                     "endpoint_label": phone.get("type", "")
                 }
-                for phone in contact.get("phoneNumbers", [])
+                for phone in phones or _E
             ]
             # if the names are conflicting for whatsapp and contact , ensure the contact does have a whatsapp linked contact
+            # Stored lists become live engine state: fresh [] only on a miss, never the shared _E
             updated_contact = {
                 "resourceName": resource_name,
-                "etag": uuid.uuid4().hex,
+                "etag": etags[i].hex,
                 "names": names,
-                "emailAddresses": contact.get("emailAddresses", []),
-                "phoneNumbers": contact.get("phoneNumbers", []),
-                "organizations": contact.get("organizations", []),
-                "addresses": contact.get("addresses", []) or [],
+                "emailAddresses": contact.get("emailAddresses") or [],
+                "phoneNumbers": phones or [],
+                "organizations": contact.get("organizations") or [],
+                "addresses": contact.get("addresses") or [],
                 "notes": contact.get("notes", ""),
                 "phone": {
                     "contact_id": contact_uuid,
@@ -191,8 +216,8 @@ def port_db_whatsapp_and_contacts(port_contact_db,port_whatsapp_db) -> None:
         return merge_whatsapp_contacts(whatsapp_contacts, parsed_contacts)
 
     # Parse JSON data
-    whatsapp_data = json.loads(port_whatsapp_db)
-    contact_data = json.loads(port_contact_db)
+    whatsapp_data = load_source(port_whatsapp_db)
+    contact_data = load_source(port_contact_db)
     # Convert WhatsApp data
     current_user_jid, parsed_whatsapp_contacts, parsed_whatsapp_chats = parse_whatsapp_data(whatsapp_data)
 
@@ -200,16 +225,17 @@ def port_db_whatsapp_and_contacts(port_contact_db,port_whatsapp_db) -> None:
     parsed_contacts = parse_contacts_data(contact_data, parsed_whatsapp_contacts)
 
     # Update WhatsApp database
-    whatsapp.SimulationEngine.db.DB["current_user_jid"] = current_user_jid
-    whatsapp.SimulationEngine.db.DB["contacts"] = parsed_whatsapp_contacts
-    whatsapp.SimulationEngine.db.DB["chats"] = parsed_whatsapp_chats
+    wa_db = whatsapp.SimulationEngine.db.DB
+    wa_db["current_user_jid"] = current_user_jid
+    wa_db["contacts"] = parsed_whatsapp_contacts
+    wa_db["chats"] = parsed_whatsapp_chats
 
     # Update contacts database
     contacts.SimulationEngine.db.DB["myContacts"] = parsed_contacts
 
-    # Save and reload databases
+    # Persist databases (in-memory DBs are already current; no reload)
     contacts.SimulationEngine.db.save_state("/content/DBs/portal_db_contacts.json")
-    contacts.SimulationEngine.db.load_state("/content/DBs/portal_db_contacts.json")
     whatsapp.SimulationEngine.db.save_state("/content/DBs/portal_db_whatsapp.json")
-    whatsapp.SimulationEngine.db.load_state("/content/DBs/portal_db_whatsapp.json")
-"""
\ No newline at end of file
+
+
+whatsapp_contacts_port = port_source(__name__)
@@ -2,19 +2,22 @@
 from __future__ import annotations
 
 import os
+from functools import lru_cache
+from itertools import chain, islice
 from typing import Dict, Any, List, Tuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait, FIRST_COMPLETED, ALL_COMPLETED
 
 import nbformat
-from nbformat.v4 import new_notebook, new_markdown_cell
+from nbformat.v4 import new_notebook
 
 from generator_utils import (
     log, CODEBASE_ROOT, CODEBASE_FOLDER_NAME,
     DEFAULT_DB_PATHS, SERVICE_SPECS, REQUIRED_INPUTS,
     mount_and_import_codebase, auth_services,
-    resolve_output_folder_id, empty_drive_folder, upload_notebook_to_drive,
-    read_sheet_as_dicts, get_first_sheet_title,
-    build_service_code_map_with_logs, services_from_initial_db_columns,
-    build_setup_cells, build_import_and_port_cell, build_empty_block, build_warnings_cell,
+    resolve_output_folder_id, empty_drive_folder, upload_notebook_to_drive, thread_drive_service,
+    read_sheets_as_dicts, get_first_sheet_title, get_spreadsheet_meta,
+    build_service_code_map_with_logs, services_from_initial_db_columns, parse_json_text,
+    build_setup_cells, build_import_and_port_cell, build_empty_block, build_warnings_cell, new_markdown_cell,
     upsert_summary_sheet, _now_pacific
 )
 
@@ -26,6 +29,8 @@ SUMMARY_SHEET_NAME = os.environ.get("SUMMARY_SHEET_NAME", "Automated_Generated_C
 
 # output folder can be an ID or a subfolder name
 OUT_HINT           = os.environ.get("TEMPLATE_OUT_FOLDER_NAME", "generated_colabs").strip()
+MAX_WORKERS        = int(os.environ.get("MAX_WORKERS", "6"))                       # upload threads
+BUILD_WORKERS      = int(os.environ.get("BUILD_WORKERS", str(os.cpu_count() or 1)))  # notebook-building processes
 
 # ----------- NOTEBOOK BUILDERS -----------
 def build_metadata_cell(task_id: str, api_modules: List[str]):
@@ -41,6 +46,18 @@ def build_metadata_cell(task_id: str, api_modules: List[str]):
     md.append("\n**Databases:**")
     return new_markdown_cell("".join(md))
 
+@lru_cache(maxsize=256)
+def _service_plan(selected: Tuple[str, ...]) -> Tuple[Tuple[str, ...], Tuple[str, ...], Tuple[str, ...]]:
+    """(expanded services, api modules, required input columns) for one selected-service set.
+    Rows share a handful of service combinations, so this runs once per combination, not per row."""
+    expanded = tuple(dict.fromkeys(chain(
+        selected,
+        *(SERVICE_SPECS[s].get("requires", []) for s in selected if s in SERVICE_SPECS),
+    )))
+    api_modules = tuple(dict.fromkeys(SERVICE_SPECS[s]["api"] for s in expanded if s in SERVICE_SPECS))
+    needed = tuple(sorted({c for s in expanded for c in REQUIRED_INPUTS.get(s, [])}))
+    return expanded, api_modules, needed
+
 def generate_notebook_for_row(
     row: Dict[str, str],
     idx: int,
@@ -52,34 +69,20 @@ def generate_notebook_for_row(
     # services by *_initial_db presence
     selected = services_from_initial_db_columns(row)
 
-    # build api_modules including dependencies
-    api_modules: List[str] = []
-    expanded: List[str] = list(selected)
-    for s in selected:
-        spec = SERVICE_SPECS.get(s)
-        if spec:
-            for r in spec.get("requires", []):
-                if r not in expanded:
-                    expanded.append(r)
-
-    for s in expanded:
-        spec = SERVICE_SPECS.get(s)
-        if spec:
-            api = spec["api"]
-            if api not in api_modules:
-                api_modules.append(api)
+    # build api_modules including dependencies (memoized per distinct service set)
+    expanded_t, api_modules_t, needed = _service_plan(tuple(selected))
+    expanded: List[str] = list(expanded_t)
+    api_modules: List[str] = list(api_modules_t)
 
     # issues block (validation)
     issues = {"unknown_services": [s for s in expanded if s not in SERVICE_SPECS], "missing_inputs": [], "json_errors": {}}
-    # validate required inputs
-    needed = sorted({c for s in expanded for c in REQUIRED_INPUTS.get(s, [])})
-    import json as _json
+    # validate required inputs (parse is cached and reused when the cell is rendered)
     for col in needed:
-        v = row.get(col, "")
-        if not str(v).strip():
+        v = str(row.get(col, "")).strip()
+        if not v:
             issues["missing_inputs"].append(col)
         else:
-            try: _json.loads(str(v))
+            try: parse_json_text(v)
             except Exception as e: issues["json_errors"][col] = str(e)
 
     nb = new_notebook()
@@ -104,6 +107,31 @@ def generate_notebook_for_row(
     nb.metadata["language_info"] = {"name": "python"}
     return nb, issues
 
+# ----------- PARALLEL WORKERS -----------
+# Notebook building is pure CPU (process pool); uploads are network-bound (thread pool).
+_GEN_CTX: Dict[str, Any] = {}
+
+def _init_build_worker(setup_cell: str, pipinstall_cell: str, code_map: Dict[str, str], meta_map: Dict[str, Tuple[str, str]]):
+    # run-wide inputs are shipped to each process once, not pickled with every row
+    _GEN_CTX.update(setup_cell=setup_cell, pipinstall_cell=pipinstall_cell, code_map=code_map, meta_map=meta_map)
+
+def build_notebook_worker(idx: int, row: Dict[str, str]) -> Tuple[nbformat.NotebookNode, Dict[str, Any]]:
+    c = _GEN_CTX
+    return generate_notebook_for_row(row, idx, c["setup_cell"], c["pipinstall_cell"], c["code_map"], c["meta_map"])
+
+def upload_worker(out_folder_id: str, fname: str, nb: nbformat.NotebookNode) -> str:
+    _, colab_url = upload_notebook_to_drive(thread_drive_service(), out_folder_id, fname, nb)
+    return colab_url
+
+def _log_issues(task_id: str, issues: Dict[str, Any]):
+    if not any(issues.values()):
+        return
+    if issues["unknown_services"]: log.warning("Unknown services for %s: %s", task_id, ", ".join(issues["unknown_services"]))
+    if issues["missing_inputs"]:   log.warning("Missing inputs for %s: %s", task_id, ", ".join(issues["missing_inputs"]))
+    if issues["json_errors"]:
+        for col, err in issues["json_errors"].items():
+            log.warning("JSON error in %s for %s: %s", col, task_id, err)
+
 # ----------- MAIN -----------
 def main():
     if not SPREADSHEET_ID: raise RuntimeError("SPREADSHEET_ID is required.")
@@ -119,48 +147,86 @@ def main():
     log.info("Output notebooks Drive folder id: %s", out_folder_id)
     # empty_drive_folder(drive, out_folder_id)
 
-    src_name = SOURCE_SHEET_NAME or get_first_sheet_title(sheets, SPREADSHEET_ID)
-    log.info("Reading tasks from sheet '%s'", src_name)
+    # one metadata call (tab titles/ids, reused for the summary upsert) + one batchGet for tasks and live code
+    meta = get_spreadsheet_meta(sheets, SPREADSHEET_ID)
+    src_name = SOURCE_SHEET_NAME or get_first_sheet_title(sheets, SPREADSHEET_ID, meta)
+    log.info("Reading tasks from sheet '%s' and live code from '%s'", src_name, CODE_SHEET_NAME)
+    tables = read_sheets_as_dicts(sheets, SPREADSHEET_ID, [src_name, CODE_SHEET_NAME])
 
-    headers, rows = read_sheet_as_dicts(sheets, SPREADSHEET_ID, src_name)
+    headers, rows = tables[src_name]
     if not rows:
         log.warning("No rows in source sheet.")
         return
     log.info("Loaded %d tasks.", len(rows))
 
     # live code
-    code_map, meta_map = build_service_code_map_with_logs(sheets, SPREADSHEET_ID, CODE_SHEET_NAME)
-
-    # generate & upload
-    results: List[List[str]] = []
-    for i, row in enumerate(rows, start=1):
-        task_id = (row.get("task_id") or f"row-{i}").strip() or f"row-{i}"
-        sel = services_from_initial_db_columns(row)
-        log.info("---- Generating (template) for task_id=%s ----", task_id)
-        log.info("Selected services: %s", " | ".join(sel) if sel else "(none)")
-
-        nb, issues = generate_notebook_for_row(row, i, setup_cell, pipinstall_cell, code_map, meta_map)
-        fname = f"Gemini_Apps_ID_Data_Port_{task_id}.ipynb"
-        _, colab_url = upload_notebook_to_drive(drive, out_folder_id, fname, nb)
-        log.info("Uploaded: %s", fname)
-        log.info("Colab URL: %s", colab_url)
-        results.append([task_id, colab_url])
-
-        # warn if validation issues
-        if any(issues.values()):
-            if issues["unknown_services"]: log.warning("Unknown services for %s: %s", task_id, ", ".join(issues["unknown_services"]))
-            if issues["missing_inputs"]:   log.warning("Missing inputs for %s: %s", task_id, ", ".join(issues["missing_inputs"]))
-            if issues["json_errors"]:
-                for col, err in issues["json_errors"].items():
-                    log.warning("JSON error in %s for %s: %s", col, task_id, err)
+    code_map, meta_map = build_service_code_map_with_logs(sheets, SPREADSHEET_ID, CODE_SHEET_NAME, table=tables[CODE_SHEET_NAME])
+
+    # generate (process pool) & upload (thread pool); failed rows stay in the summary with an empty URL
+    done: List[Tuple[int, str, str]] = []
+    uploads_pending: Dict[Any, Tuple[int, str]] = {}
+
+    def _drain(return_when):
+        finished, _ = wait(uploads_pending, return_when=return_when)
+        for fut in finished:
+            idx, task_id = uploads_pending.pop(fut)
+            try:
+                colab_url = fut.result()
+                log.info("Uploaded %s → %s", task_id, colab_url)
+            except Exception as e:
+                log.error("Upload failed for task_id=%s: %s", task_id, e)
+                colab_url = ""
+            done.append((idx, task_id, colab_url))
+
+    log.info("Starting parallel build (%d process(es)) / upload (%d thread(s))…", BUILD_WORKERS, MAX_WORKERS)
+    with ProcessPoolExecutor(
+        max_workers=BUILD_WORKERS,
+        initializer=_init_build_worker,
+        initargs=(setup_cell, pipinstall_cell, code_map, meta_map),
+    ) as builders, ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="tpl") as uploaders:
+        builds: Dict[Any, Tuple[int, str]] = {}
+        pending_rows = enumerate(rows, start=1)
+
+        def _submit_builds():
+            # top the pool up to 2 rows per build process: finished notebooks wait in this process
+            # until consumed, so queueing every row up front piles them up whenever uploads lag
+            for i, row in islice(pending_rows, 2 * BUILD_WORKERS - len(builds)):
+                task_id = (row.get("task_id") or f"row-{i}").strip() or f"row-{i}"
+                sel = services_from_initial_db_columns(row)
+                log.info("---- Generating (template) for task_id=%s; selected services: %s ----", task_id, " | ".join(sel) if sel else "(none)")
+                builds[builders.submit(build_notebook_worker, i, row)] = (i, task_id)
+
+        _submit_builds()
+        while builds:
+            finished, _ = wait(builds, return_when=FIRST_COMPLETED)
+            for fut in finished:
+                idx, task_id = builds.pop(fut)
+                try:
+                    nb, issues = fut.result()
+                except Exception as e:
+                    log.error("Build failed for task_id=%s: %s", task_id, e)
+                    done.append((idx, task_id, ""))
+                    continue
+                _log_issues(task_id, issues)
+                fname = f"Gemini_Apps_ID_Data_Port_{task_id}.ipynb"
+                uploads_pending[uploaders.submit(upload_worker, out_folder_id, fname, nb)] = (idx, task_id)
+                # bound the built-but-not-uploaded notebooks held in memory
+                if len(uploads_pending) >= 2 * MAX_WORKERS:
+                    _drain(FIRST_COMPLETED)
+            _submit_builds()
+        if uploads_pending:
+            _drain(ALL_COMPLETED)
+
+    done.sort(key=lambda x: x[0])
+    results: List[List[str]] = [[task_id, colab_url] for _, task_id, colab_url in done]
 
     # summary: task_id, colab_url, refresh_date, refresh_time
     refresh_date, refresh_time = _now_pacific()
     headers = ["task_id", "colab_url", "refresh_date", "refresh_time"]
     rows = [r + [refresh_date, refresh_time] for r in results]
-    upsert_summary_sheet(sheets, SPREADSHEET_ID, SUMMARY_SHEET_NAME, headers, rows)
+    upsert_summary_sheet(sheets, SPREADSHEET_ID, SUMMARY_SHEET_NAME, headers, rows, meta=meta)
 
-    log.info("Finished. %d notebook(s) written.", len(results))
+    log.info("Finished. %d notebook(s) written.", sum(1 for _, url in results if url))
 
 # if __name__ == "__main__":
 #     main()
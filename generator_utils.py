@@ -1,17 +1,25 @@
 # generator_utils.py
 from __future__ import annotations
 
-import os, sys, re, json, pprint, logging
+import os, sys, re, json, time, random, pprint, logging, threading
 from typing import Dict, Any, List, Optional, Tuple
 from datetime import datetime, timezone
+from functools import lru_cache
 
 import nbformat
-from nbformat.v4 import new_notebook, new_markdown_cell, new_code_cell
+from nbformat.v4 import new_notebook, writes_json
+from nbformat.corpus.words import generate_corpus_id as random_cell_id
 
 # colab + google apis (present in Colab)
 from google.colab import auth, drive as gdrive_mount  # type: ignore
 from googleapiclient.discovery import build           # type: ignore
 from googleapiclient.http import MediaInMemoryUpload  # type: ignore
+from googleapiclient.errors import HttpError          # type: ignore
+
+try:
+    import orjson  # optional: several times faster than stdlib json on large initial-DB blobs
+except ImportError:
+    orjson = None
 
 # ----------------------------
 # Logging (stdout, live in Colab)
@@ -82,11 +90,7 @@ PORTING_SPECS: Dict[str, Dict[str, Any]] = {
             ("contacts_initial_db", "contacts_src_json",  False),
             ("whatsapp_initial_db", "whatsapp_src_json",  False),
         ],
-        "pre_call_lines": [
-            "port_contact_db = contacts_src_json",
-            "port_whatsapp_db = whatsapp_src_json",
-        ],
-        "call": "port_db_whatsapp_and_contacts(port_contact_db, port_whatsapp_db)",
+        "call": "port_db_whatsapp_and_contacts(contacts_src_json, whatsapp_src_json)",
     },
     "calendar": {
         "json_vars":   [("calendar_initial_db", "port_calender_db", True)],
@@ -98,8 +102,7 @@ PORTING_SPECS: Dict[str, Dict[str, Any]] = {
     },
     "gmail": {
         "json_vars":   [("gmail_initial_db", "gmail_src_json", False)],
-        "pre_call_lines": ["port_gmail_db_key = gmail_src_json"],
-        "call":        "port_gmail_db(port_gmail_db_key)",
+        "call":        "port_gmail_db(gmail_src_json)",
     },
     "device_settings": {
         "json_vars":   [("device_settings_initial_db", "device_settings_src_json", False)],
@@ -158,86 +161,181 @@ def auth_services():
     sheets = build("sheets", "v4")
     return drive, sheets
 
+_thread_local = threading.local()
+
+def thread_drive_service():
+    # googleapiclient/httplib2 clients are not thread-safe: one Drive client per worker thread
+    drive = getattr(_thread_local, "drive", None)
+    if drive is None:
+        drive = _thread_local.drive = build("drive", "v3")
+    return drive
+
+_SERVICE_SYNONYMS: Dict[str, str] = {
+    "google calendar": "calendar", "calender": "calendar",
+    "google mail": "gmail", "email": "gmail", "e-mail": "gmail",
+    "media control": "media_control",
+    "device settings": "device_settings",
+    "whatsapp message": "whatsapp", "whatsapp messages": "whatsapp",
+    "message": "whatsapp", "messages": "whatsapp",
+    "reminder": "reminders", "generic reminders": "reminders",
+    "notes and lists": "notes", "notes_and_lists": "notes",
+}
+_RE_SERVICE_SEP = re.compile(r"[/&\s]+")  # separators inside one service token
+
+# sheet cells mostly hold canonical names already; those return before any regex work
+# (only names the separator pass and the synonym table would leave unchanged, so "home" still maps).
+# Each maps to the spec table's own interned key, so later spec/column lookups match on identity.
+_CANONICAL_SERVICES: Dict[str, str] = {
+    s: s for s in SERVICE_SPECS if _SERVICE_SYNONYMS.get(s, s) == s and not _RE_SERVICE_SEP.search(s)
+}
+
 def normalize_service_token(tok: str) -> str:
-    t = re.sub(r"[/&]", " ", str(tok).strip().lower())
-    t = re.sub(r"\s+", " ", t)
-    synonyms = {
-        "google calendar": "calendar", "calender": "calendar",
-        "google mail": "gmail", "email": "gmail", "e-mail": "gmail",
-        "media control": "media_control",
-        "device settings": "device_settings",
-        "whatsapp message": "whatsapp", "whatsapp messages": "whatsapp",
-        "message": "whatsapp", "messages": "whatsapp",
-        "reminder": "reminders", "generic reminders": "reminders",
-        "notes and lists": "notes", "notes_and_lists": "notes",
-    }
-    return synonyms.get(t, t)
+    t = str(tok).strip().lower()
+    canon = _CANONICAL_SERVICES.get(t)
+    if canon is not None:
+        return canon
+    t = _RE_SERVICE_SEP.sub(" ", t).strip()
+    return _SERVICE_SYNONYMS.get(t, t)
+
+# orjson turns integers wider than 64 bits into floats; text with a 19+ digit run goes to stdlib json instead
+_RE_LONG_DIGITS = re.compile(r"\d{19}")
+
+@lru_cache(maxsize=32)
+def parse_json_text(s: str) -> Any:
+    """json.loads semantics at orjson speed. Cached so a row's preflight check and its cell
+    rendering share one parse; the result is shared, callers must not mutate it."""
+    if orjson is not None and not _RE_LONG_DIGITS.search(s):
+        try:
+            return orjson.loads(s)
+        except orjson.JSONDecodeError:
+            pass  # NaN/Infinity, lone surrogates, bad JSON: stdlib accepts or raises its usual message
+    return json.loads(s)
 
 def parse_initial_db(cell_value: Optional[str]) -> Dict[str, Any]:
     if cell_value is None: return {}
     s = str(cell_value).strip()
     if not s or s.lower() in {"nan","none","null"}: return {}
-    return json.loads(s)
+    return parse_json_text(s)
 
-def py_literal(obj: Any) -> str:
-    return pprint.pformat(obj, width=100, sort_dicts=False)
+def _json_indented(obj: Any) -> str:
+    if orjson is not None:
+        try:
+            out = orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+        except orjson.JSONEncodeError:
+            out = None
+        # orjson writes NaN/Infinity as null, so a null in the output needs the (C-speed) allow_nan check
+        if out is not None and (b"null" not in out or _all_finite(obj)):
+            return out.decode("utf-8")
+    return json.dumps(obj, ensure_ascii=False, indent=2)
+
+def _all_finite(obj: Any) -> bool:
+    try:
+        json.dumps(obj, allow_nan=False)
+    except ValueError:
+        return False
+    return True
+
+# json.dumps output already is a Python literal except for the bare JSON tokens below. With indent=2 every nested
+# scalar sits after a space and ends its own line, and JSON strings never hold a raw newline, so " tok,\n" and
+# " tok\n" can't occur inside a string value. Plain str.replace per token: a regex pass over a large DB costs
+# more than the orjson dump itself.
+_JSON_TO_PY = {"true": "True", "false": "False", "null": "None",
+               "NaN": 'float("nan")', "Infinity": 'float("inf")', "-Infinity": '-float("inf")'}
+_JSON_TOKEN_EDITS = tuple(
+    (tok, ((f" {tok},\n", f" {py},\n"), (f" {tok}\n", f" {py}\n"))) for tok, py in _JSON_TO_PY.items()
+)
 
+def py_literal(obj: Any) -> str:
+    # values come from json.loads; anything json can't express falls back to pprint
+    try:
+        s = _json_indented(obj)
+    except (TypeError, ValueError):
+        return pprint.pformat(obj, width=100, sort_dicts=False)
+    if s in _JSON_TO_PY:  # top-level scalar
+        return _JSON_TO_PY[s]
+    for tok, edits in _JSON_TOKEN_EDITS:
+        if tok in s:
+            for a, b in edits:
+                s = s.replace(a, b)
+    return s
+
+# One token per comment or string literal (triple quotes first); an unterminated literal runs to EOF.
+# Text between tokens is copied by the regex engine untouched.
+_RE_PY_TOKEN = re.compile(r"""
+      \#[^\n]*
+    | (?P<tq>\"\"\"|\'\'\')(?:\\.|.)*?(?:(?P=tq)|\Z)
+    | "(?:\\.?|[^"\\])*(?:"|\Z)
+    | '(?:\\.?|[^'\\])*(?:'|\Z)
+""", re.S | re.X)
+_RE_BARE_NEWLINE = re.compile(r"\\.|\n", re.S)  # escaped pairs are kept verbatim, bare newlines re-escaped
+
+def _reescape_token(m: "re.Match[str]") -> str:
+    tok = m.group(0)
+    if tok[0] == "#" or "\n" not in tok:
+        return tok
+    return _RE_BARE_NEWLINE.sub(lambda e: "\\n" if e.group(0) == "\n" else e.group(0), tok)
+
+@lru_cache(maxsize=256)
 def reescape_newlines_inside_string_literals(src: str) -> str:
+    # setup/pip cells and live port code repeat on every row: cached per distinct source
     if not src: return ""
-    s = src.replace("\r\n","\n").replace("\r","\n")
-    out=[]; i=0; n=len(s); in_str=False; triple=False; quote=''; escape=False; in_comment=False
-    while i<n:
-        ch=s[i]
-        if in_comment:
-            out.append(ch); 
-            if ch=="\n": in_comment=False
-            i+=1; continue
-        if in_str:
-            if escape: out.append(ch); escape=False
-            elif ch=="\\": out.append(ch); escape=True
-            elif triple:
-                if ch==quote and i+2<n and s[i+1]==quote and s[i+2]==quote:
-                    out+=[ch,quote,quote]; i+=3; in_str=triple=False
-                else:
-                    out.append("\\n" if ch=="\n" else ch); i+=1
-                continue
-            else:
-                if ch=="\n": out.append("\\n")
-                elif ch==quote: out.append(ch); in_str=False
-                else: out.append(ch)
-            i+=1; continue
-        if ch=="#":
-            in_comment=True; out.append(ch); i+=1; continue
-        if ch in ("'",'"'):
-            if i+2<n and s[i+1]==ch and s[i+2]==ch:
-                out+=[ch,ch,ch]; i+=3; in_str=True; triple=True; quote=ch
-            else:
-                out.append(ch); i+=1; in_str=True; triple=False; quote=ch
-            continue
-        out.append(ch); i+=1
-    return "".join(out)
+    # a single `in` scan covers the usual LF-only source; two str.replace beat one r"\r\n?" sub on CRLF text
+    s = src.replace("\r\n","\n").replace("\r","\n") if "\r" in src else src
+    # nothing to rewrite without both a newline and a quote (e.g. pip cells): skip the token scan
+    if "\n" not in s or ('"' not in s and "'" not in s): return s
+    return _RE_PY_TOKEN.sub(_reescape_token, s)
+
+# ----- Google API calls
+RETRYABLE_HTTP_STATUSES = (429, 500, 502, 503, 504)
+
+def execute_with_retries(request, max_retries: int = 5, base_delay: float = 1.0):
+    """request.execute(), retried with jittered exponential backoff on quota (429) and transient 5xx errors."""
+    attempt = 0
+    while True:
+        try:
+            return request.execute()
+        except HttpError as e:
+            status = getattr(e.resp, "status", None)
+            if status not in RETRYABLE_HTTP_STATUSES or attempt >= max_retries:
+                raise
+            sleep_s = min(base_delay * (2 ** attempt), 32.0) + random.uniform(0, base_delay)
+            log.warning("Google API HTTP %s; retry %d/%d in %.1fs", status, attempt + 1, max_retries, sleep_s)
+            time.sleep(sleep_s)
+            attempt += 1
 
 # ----- Drive helpers
+# (parent folder id or "root", name) -> folder id; main() reruns in the same Colab session skip the lookups
+_FOLDER_IDS: Dict[Tuple[str, str], str] = {}
+
 def find_root_folder_id(drive, name: str) -> str:
+    key = ("root", name)
+    if key in _FOLDER_IDS:
+        return _FOLDER_IDS[key]
     q = f"name='{name}' and mimeType='application/vnd.google-apps.folder' and 'root' in parents and trashed=false"
-    res = drive.files().list(q=q, fields="files(id,name)").execute().get("files", [])
+    res = execute_with_retries(drive.files().list(q=q, fields="files(id,name)")).get("files", [])
     if not res:
         raise RuntimeError(f"Folder '{name}' not found in My Drive root.")
+    _FOLDER_IDS[key] = res[0]["id"]
     return res[0]["id"]
 
 def ensure_subfolder(drive, parent_id: str, name: str) -> str:
+    key = (parent_id, name)
+    if key in _FOLDER_IDS:
+        return _FOLDER_IDS[key]
     q = f"'{parent_id}' in parents and name='{name}' and mimeType='application/vnd.google-apps.folder' and trashed=false"
-    res = drive.files().list(q=q, fields="files(id,name)").execute().get("files", [])
+    res = execute_with_retries(drive.files().list(q=q, fields="files(id,name)")).get("files", [])
     if res:
-        return res[0]["id"]
-    meta = {"name": name, "mimeType": "application/vnd.google-apps.folder", "parents": [parent_id]}
-    folder = drive.files().create(body=meta, fields="id").execute()
-    return folder["id"]
+        folder_id = res[0]["id"]
+    else:
+        meta = {"name": name, "mimeType": "application/vnd.google-apps.folder", "parents": [parent_id]}
+        folder_id = execute_with_retries(drive.files().create(body=meta, fields="id"))["id"]
+    _FOLDER_IDS[key] = folder_id
+    return folder_id
 
 def resolve_output_folder_id(drive, out_hint: str, codebase_folder_name: str) -> str:
     if out_hint:
         try:
-            meta = drive.files().get(fileId=out_hint, fields="id,name,mimeType,trashed").execute()
+            meta = execute_with_retries(drive.files().get(fileId=out_hint, fields="id,name,mimeType,trashed"))
             if meta and meta.get("mimeType") == "application/vnd.google-apps.folder" and not meta.get("trashed", False):
                 log.info("Using provided Drive folder ID: %s (%s)", meta["id"], meta["name"])
                 return meta["id"]
@@ -250,103 +348,192 @@ def resolve_output_folder_id(drive, out_hint: str, codebase_folder_name: str) ->
     base_id = find_root_folder_id(drive, codebase_folder_name)
     return ensure_subfolder(drive, base_id, "generated_colabs")
 
+DRIVE_BATCH_MAX = 100  # calls per Drive batch request
+
+def _batch_delete_files(drive, files: List[Dict[str, str]], max_retries: int = 5, base_delay: float = 1.0) -> int:
+    """Delete files via Drive batch requests (one round-trip per DRIVE_BATCH_MAX deletes);
+    per-file quota/5xx failures are re-batched with the same backoff as execute_with_retries."""
+    by_id = {f["id"]: f for f in files}
+    pending = list(by_id)
+    removed = 0
+    for attempt in range(max_retries + 1):
+        retry: List[str] = []
+
+        def _on_delete(fid, _resp, exc):
+            nonlocal removed
+            f = by_id[fid]
+            if exc is None:
+                removed += 1
+                log.info("  - removed: %s", f.get("name",""))
+            elif (isinstance(exc, HttpError) and attempt < max_retries
+                  and getattr(exc.resp, "status", None) in RETRYABLE_HTTP_STATUSES):
+                retry.append(fid)
+            else:
+                log.warning("  - could not remove %s (%s)", f.get("name",""), exc)
+
+        for i in range(0, len(pending), DRIVE_BATCH_MAX):
+            chunk = pending[i:i + DRIVE_BATCH_MAX]
+            batch = drive.new_batch_http_request(callback=_on_delete)
+            for fid in chunk:
+                batch.add(drive.files().delete(fileId=fid), request_id=fid)
+            try:
+                execute_with_retries(batch)
+            except Exception as e:
+                for fid in chunk:
+                    _on_delete(fid, None, e)
+        if not retry:
+            break
+        time.sleep(min(base_delay * (2 ** attempt), 32.0) + random.uniform(0, base_delay))
+        pending = retry
+    return removed
+
 def empty_drive_folder(drive, folder_id: str) -> int:
     log.info("Emptying output folder (id=%s) before generation …", folder_id)
     removed = 0; page_token = None
     while True:
-        resp = drive.files().list(
+        resp = execute_with_retries(drive.files().list(
             q=f"'{folder_id}' in parents and trashed=false",
-            fields="nextPageToken, files(id, name, mimeType)", pageToken=page_token
-        ).execute()
+            fields="nextPageToken, files(id, name, mimeType)", pageToken=page_token,
+            pageSize=DRIVE_BATCH_MAX,
+        ))
         files = resp.get("files", [])
         if not files: break
-        for f in files:
-            try:
-                drive.files().delete(fileId=f["id"]).execute()
-                removed += 1
-                log.info("  - removed: %s", f.get("name",""))
-            except Exception as e:
-                log.warning("  - could not remove %s (%s)", f.get("name",""), e)
+        removed += _batch_delete_files(drive, files)
         page_token = resp.get("nextPageToken", None)
         if not page_token: break
     log.info("Output folder emptied: %d item(s) removed.", removed)
     return removed
 
+MULTIPART_UPLOAD_MAX_BYTES = 5 * 1024 * 1024  # Drive v3 limit for non-resumable uploads
+
+def notebook_bytes(nb: nbformat.NotebookNode) -> bytes:
+    # No jsonschema validation pass (nbformat.writes() runs one): every notebook here comes
+    # from the new_*_cell builders, so there is nothing for it to catch.
+    if orjson is not None:
+        # same document as writes_json(), with each cell source kept as one string instead of a
+        # list of lines (both are valid v4); the notebook holds only str/int/list/dict values
+        return orjson.dumps(nb, option=orjson.OPT_INDENT_2 | orjson.OPT_SORT_KEYS) + b"\n"
+    return writes_json(nb).encode("utf-8")
+
 def upload_notebook_to_drive(drive, folder_id: str, filename: str, nb: nbformat.NotebookNode) -> Tuple[str, str]:
-    data = nbformat.writes(nb).encode("utf-8")
-    media = MediaInMemoryUpload(data, mimetype="application/vnd.google.colaboratory", resumable=False)
+    data = notebook_bytes(nb)
+    # multipart is one request; a resumable session costs an extra round-trip and is only needed past 5 MB
+    media = MediaInMemoryUpload(data, mimetype="application/vnd.google.colaboratory",
+                                resumable=len(data) > MULTIPART_UPLOAD_MAX_BYTES)
     meta = {"name": filename, "mimeType": "application/vnd.google.colaboratory", "parents": [folder_id]}
-    file = drive.files().create(body=meta, media_body=media, fields="id,webViewLink").execute()
+    file = execute_with_retries(drive.files().create(body=meta, media_body=media, fields="id,webViewLink"))
     file_id = file["id"]
     colab_url = f"https://colab.research.google.com/drive/{file_id}"
     return file_id, colab_url
 
 # ----- Sheets helpers
-def get_first_sheet_title(sheets, spreadsheet_id: str) -> str:
-    meta = sheets.spreadsheets().get(spreadsheetId=spreadsheet_id).execute()
+def get_spreadsheet_meta(sheets, spreadsheet_id: str) -> Dict[str, Any]:
+    # tab properties only (no grid data): enough for titles, ids and existence checks
+    return execute_with_retries(sheets.spreadsheets().get(
+        spreadsheetId=spreadsheet_id, fields="sheets.properties(sheetId,title,gridProperties)"
+    ))
+
+def get_first_sheet_title(sheets, spreadsheet_id: str, meta: Optional[Dict[str, Any]] = None) -> str:
+    meta = meta or get_spreadsheet_meta(sheets, spreadsheet_id)
     return meta["sheets"][0]["properties"]["title"]
 
 def read_sheet_as_dicts(sheets, spreadsheet_id: str, sheet_name: str) -> Tuple[List[str], List[Dict[str, str]]]:
     rng = f"'{sheet_name}'"
-    resp = sheets.spreadsheets().values().get(spreadsheetId=spreadsheet_id, range=rng).execute()
-    values = resp.get("values", [])
+    resp = execute_with_retries(sheets.spreadsheets().values().get(
+        spreadsheetId=spreadsheet_id, range=rng, fields="values"
+    ))
+    return _values_to_dicts(resp.get("values", []))
+
+def read_sheets_as_dicts(sheets, spreadsheet_id: str, sheet_names: List[str]) -> Dict[str, Tuple[List[str], List[Dict[str, str]]]]:
+    # one values.batchGet round-trip for several tabs
+    resp = execute_with_retries(sheets.spreadsheets().values().batchGet(
+        spreadsheetId=spreadsheet_id, ranges=[f"'{n}'" for n in sheet_names], fields="valueRanges(values)"
+    ))
+    value_ranges = resp.get("valueRanges", [])
+    return {
+        name: _values_to_dicts(value_ranges[i].get("values", []) if i < len(value_ranges) else [])
+        for i, name in enumerate(sheet_names)
+    }
+
+def _values_to_dicts(values: List[List[str]]) -> Tuple[List[str], List[Dict[str, str]]]:
     if not values:
         return [], []
-    headers = [h.strip() for h in values[0]]
+    # interned so lookups by the (compiler-interned) column literals match on identity
+    headers = [sys.intern(h.strip()) for h in values[0]]
+    # Sheets drops trailing empty cells: start each row from an all-blank copy and overlay
+    # the cells it has (zip stops at the shorter side, so extra cells are ignored)
+    blank = dict.fromkeys(headers, "")
     rows: List[Dict[str, str]] = []
     for r in values[1:]:
-        rows.append({headers[i]: (r[i] if i < len(r) else "") for i in range(len(headers))})
+        row = blank.copy()
+        row.update(zip(headers, r))
+        rows.append(row)
     return headers, rows
 
 # ----- Service selection
+# (service, primary column) in REQUIRED_INPUTS order; the first column listed is the one that selects it
+_PRIMARY_COLUMNS: Tuple[Tuple[str, str], ...] = tuple(
+    (svc, cols[0]) for svc, cols in REQUIRED_INPUTS.items() if cols
+)
+
 def services_from_initial_db_columns(row: Dict[str, str]) -> List[str]:
-    selected: List[str] = []
-    for svc, cols in REQUIRED_INPUTS.items():
-        if not cols: continue
-        primary = cols[0]
-        if str(row.get(primary, "")).strip():
-            selected.append(svc)
-    return selected
+    return [svc for svc, primary in _PRIMARY_COLUMNS if str(row.get(primary, "")).strip()]
 
 # ----- Code sheet (latest per service) + logs
-def _find_header(headers: List[str], candidates: List[str]) -> Optional[str]:
-    hnorm = [h.strip().lower() for h in headers]
+def _header_map(headers: List[str]) -> Dict[str, str]:
+    # normalized -> original, in sheet order; the first of two same-named headers wins, as before
+    hmap: Dict[str, str] = {}
+    for h in headers: hmap.setdefault(h.strip().lower(), h)
+    return hmap
+
+def _find_header(hmap: Dict[str, str], candidates: List[str]) -> Optional[str]:
     for cand in candidates:
-        c = cand.strip().lower()
-        for i,h in enumerate(hnorm):
-            if h == c: return headers[i]
+        h = hmap.get(cand.strip().lower())
+        if h is not None: return h
     for cand in candidates:
         c = cand.strip().lower()
-        for i,h in enumerate(hnorm):
-            if c in h: return headers[i]
+        for k,h in hmap.items():
+            if c in k: return h
     return None
 
+_DATE_FORMATS = (
+    "%Y-%m-%d","%Y/%m/%d","%d-%m-%Y","%m/%d/%Y","%d/%m/%Y",
+    "%Y-%m-%d %H:%M:%S","%Y/%m/%d %H:%M:%S","%m/%d/%Y %H:%M:%S","%d/%m/%Y %H:%M:%S",
+    "%b %d, %Y","%d %b %Y","%b %d %Y","%Y.%m.%d",
+)
+
+@lru_cache(maxsize=1024)
 def _parse_any_date(s: str) -> Optional[datetime]:
     if not s: return None
     s = s.strip()
-    fmts = [
-        "%Y-%m-%d","%Y/%m/%d","%d-%m-%Y","%m/%d/%Y","%d/%m/%Y",
-        "%Y-%m-%d %H:%M:%S","%Y/%m/%d %H:%M:%S","%m/%d/%Y %H:%M:%S","%d/%m/%Y %H:%M:%S",
-        "%b %d, %Y","%d %b %Y","%b %d %Y","%Y.%m.%d",
-    ]
-    for fmt in fmts:
-        try: return datetime.strptime(s, fmt)
-        except Exception: pass
+    # ISO text (the usual sheet value) parses in C without the strptime/exception walk; no format
+    # above accepts a string fromisoformat also accepts with a different result, so order is safe
     try: return datetime.fromisoformat(s.replace("Z","+00:00"))
-    except Exception: return None
+    except ValueError: pass
+    for fmt in _DATE_FORMATS:
+        try: return datetime.strptime(s, fmt)
+        except ValueError: pass
+    return None
 
-def build_service_code_map_with_logs(sheets, spreadsheet_id: str, code_sheet_name: str) -> Tuple[Dict[str, str], Dict[str, Tuple[str, str]]]:
-    headers, rows = read_sheet_as_dicts(sheets, spreadsheet_id, code_sheet_name)
+def build_service_code_map_with_logs(
+    sheets,
+    spreadsheet_id: str,
+    code_sheet_name: str,
+    table: Optional[Tuple[List[str], List[Dict[str, str]]]] = None,
+) -> Tuple[Dict[str, str], Dict[str, Tuple[str, str]]]:
+    # table: (headers, rows) already fetched by the caller, e.g. via read_sheets_as_dicts
+    headers, rows = table if table is not None else read_sheet_as_dicts(sheets, spreadsheet_id, code_sheet_name)
     if not rows:
         raise RuntimeError(f"No rows found in code sheet '{code_sheet_name}'.")
 
-    svc_col  = _find_header(headers, ["service_name","service","api","services"])
-    code_col = _find_header(headers, ["function_to_translate_json","code","porting_code","port_code"])
+    hmap = _header_map(headers)
+    svc_col  = _find_header(hmap, ["service_name","service","api","services"])
+    code_col = _find_header(hmap, ["function_to_translate_json","code","porting_code","port_code"])
     if not svc_col or not code_col:
         raise RuntimeError("Missing 'service_name' and/or 'function_to_translate_json' in code sheet.")
 
-    date_col = _find_header(headers, ["translate_jsons(date_updated)","date_updated","last_updated","updated_at","modified_at","date"])
-    resp_col = _find_header(headers, ["responsible person","responsible","owner","author","updated_by"])
+    date_col = _find_header(hmap, ["translate_jsons(date_updated)","date_updated","last_updated","updated_at","modified_at","date"])
+    resp_col = _find_header(hmap, ["responsible person","responsible","owner","author","updated_by"])
 
     grouped: Dict[str, List[Dict[str,str]]] = {}
     for r in rows:
@@ -359,14 +546,11 @@ def build_service_code_map_with_logs(sheets, spreadsheet_id: str, code_sheet_nam
     meta_map: Dict[str,Tuple[str,str]] = {}
 
     for svc, items in grouped.items():
-        best_idx=-1; best_dt=None
-        for i,it in enumerate(items):
-            ds = (it.get(date_col) if date_col else "") or ""
-            dt = _parse_any_date(ds) if ds else None
-            if best_dt is None or (dt and dt>best_dt):
-                best_dt=dt; best_idx=i
-        chosen = items[best_idx] if best_idx>=0 else items[0]
-        code_str = chosen.get(code_col, "") or ""
+        # newest parsable date wins (first row on ties); with no parsable date at all, the last row
+        dated = [(dt, it) for it in items if (dt := _parse_any_date((it.get(date_col) or "") if date_col else ""))]
+        chosen = max(dated, key=lambda p: p[0])[1] if dated else items[-1]
+        # stored notebook-ready (re-escaped + stripped) once, instead of per row in build_import_and_port_cell
+        code_str = reescape_newlines_inside_string_literals(chosen.get(code_col, "") or "").strip()
         if not code_str: continue
         code_map[svc]=code_str
         d = (chosen.get(date_col) or "N/A") if date_col else "N/A"
@@ -377,9 +561,26 @@ def build_service_code_map_with_logs(sheets, spreadsheet_id: str, code_sheet_nam
     return code_map, meta_map
 
 # ----- Notebook builders (shared)
+# Same nodes nbformat.v4's new_code_cell/new_markdown_cell build, minus their per-cell jsonschema validation
+# (0.15-0.3 ms a cell, more than the rest of building a notebook). Every source passed here is a str.
+def new_code_cell(source: str = "") -> nbformat.NotebookNode:
+    return nbformat.NotebookNode(
+        id=random_cell_id(), cell_type="code", metadata=nbformat.NotebookNode(),
+        execution_count=None, source=source, outputs=[],
+    )
+
+def new_markdown_cell(source: str = "") -> nbformat.NotebookNode:
+    return nbformat.NotebookNode(id=random_cell_id(), cell_type="markdown", source=source, metadata=nbformat.NotebookNode())
+
+@lru_cache(maxsize=8)
+def _setup_sources(setup_cell: str, pipinstall_cell: str) -> Tuple[str, str]:
+    # identical on every row: strip/concat once per run, not per notebook
+    return (reescape_newlines_inside_string_literals(setup_cell).strip() + "\n",
+            reescape_newlines_inside_string_literals(pipinstall_cell).strip() + "\n")
+
 def build_setup_cells(setup_cell: str, pipinstall_cell: str):
-    setup_src = reescape_newlines_inside_string_literals(setup_cell).strip() + "\n"
-    pip_src   = reescape_newlines_inside_string_literals(pipinstall_cell).strip() + "\n"
+    # cells themselves stay per-notebook (each gets its own id); only their sources are shared
+    setup_src, pip_src = _setup_sources(setup_cell, pipinstall_cell)
     return [
         new_markdown_cell("## Download relevant files"),
         new_code_cell(setup_src),
@@ -387,6 +588,45 @@ def build_setup_cells(setup_cell: str, pipinstall_cell: str):
         new_code_cell(pip_src),
     ]
 
+@lru_cache(maxsize=32)
+def _json_var_block(col: str, var: str, as_dict: bool, cell_value: Optional[str]) -> str:
+    # parse + literal rendering is the costly part of a row; identical initial-DB cells across rows reuse it.
+    # Keys and values are DB-sized, so the bound matches parse_json_text's rather than pinning a run's DBs per worker.
+    try:
+        d = parse_initial_db(cell_value)
+    except Exception:
+        d = {}
+    if as_dict:
+        return f"# {var} from {col} (dict)\n{var} = {py_literal(d)}\n"
+    return f"# {var} from {col} (JSON string)\n{var} = json.dumps({py_literal(d)}, ensure_ascii=False)\n"
+
+# Row-invariant pieces of the import/port cell. Each returns lines already joined with "\n",
+# so appending one to the cell's line list renders exactly like appending its lines one by one.
+@lru_cache(maxsize=64)
+def _api_preamble(api_modules: Tuple[str, ...]) -> Tuple[str, str]:
+    imports = ["# Imports"] + [f"import {m}" for m in api_modules]
+    if "notes_and_lists" in api_modules:
+        imports += [
+            "from notes_and_lists.SimulationEngine.utils import update_title_index, update_content_index",
+            "from typing import Dict, Any",
+            "from datetime import timezone",
+        ]
+    imports += ["import os, json, uuid", "from datetime import datetime", ""]
+    default_dbs = ["# Load default DBs"] + [
+        f'{api}.SimulationEngine.db.load_state("{DEFAULT_DB_PATHS[api]}")' for api in api_modules if api in DEFAULT_DB_PATHS
+    ] + [""]
+    return "\n".join(imports), "\n".join(default_dbs)
+
+@lru_cache(maxsize=64)
+def _port_code_block(svc: str, code_str: str, date_upd: str, resp: str) -> str:
+    lines = [
+        f"# ==== Porting code for service: {svc} (from live sheet) ====",
+        f"# Using latest porting code for '{svc}' which was updated on {date_upd} by {resp}",
+        code_str,
+        "",
+    ]
+    return "\n".join(lines)
+
 def build_import_and_port_cell(
     api_modules: List[str],
     expanded_services: List[str],
@@ -394,15 +634,8 @@ def build_import_and_port_cell(
     code_map: Dict[str, str],
     meta_map: Dict[str, Tuple[str, str]],
 ):
-    L: List[str] = []
-    L.append("# Imports")
-    for m in api_modules:
-        L.append(f"import {m}")
-    if "notes_and_lists" in api_modules:
-        L.append("from notes_and_lists.SimulationEngine.utils import update_title_index, update_content_index")
-        L.append("from typing import Dict, Any")
-        L.append("from datetime import timezone")
-    L += ["import os, json, uuid", "from datetime import datetime", ""]
+    imports, default_dbs = _api_preamble(tuple(api_modules))
+    L: List[str] = [imports]
 
     # USER_LOCATION env injection
     user_location = (row.get("user_location") or "").strip()
@@ -411,11 +644,7 @@ def build_import_and_port_cell(
     L.append("")
 
     # Load defaults for selected APIs
-    L.append("# Load default DBs")
-    for api in api_modules:
-        if api in DEFAULT_DB_PATHS:
-            L.append(f'{api}.SimulationEngine.db.load_state("{DEFAULT_DB_PATHS[api]}")')
-    L.append("")
+    L.append(default_dbs)
 
     calls: List[str] = []
 
@@ -427,37 +656,22 @@ def build_import_and_port_cell(
 
         # inject initial DB variables
         for col, var, as_dict in spec.get("json_vars", []):
-            try:
-                d = parse_initial_db(row.get(col))
-            except Exception:
-                d = {}
-            if as_dict:
-                L += [f"# {var} from {col} (dict)", f"{var} = {py_literal(d)}", ""]
-            else:
-                L += [f"# {var} from {col} (JSON string)", f"{var} = json.dumps({py_literal(d)}, ensure_ascii=False)", ""]
+            L.append(_json_var_block(col, var, as_dict, row.get(col)))
 
         # live porting code from sheet
         code_str = code_map.get(svc, "")
         if code_str:
-            code_str = reescape_newlines_inside_string_literals(code_str).strip()
             date_upd, resp = meta_map.get(svc, ("", ""))
-            L += [
-                f"# ==== Porting code for service: {svc} (from live sheet) ====",
-                f"# Using latest porting code for '{svc}' which was updated on {date_upd} by {resp}",
-                code_str,
-                "",
-            ]
-            for ln in spec.get("pre_call_lines", []):
-                L.append(ln)
-            if spec.get("pre_call_lines"):
-                L.append("")
+            L.append(_port_code_block(svc, code_str, date_upd, resp))
             calls.append(spec["call"])
         else:
             L += [f"# (No code found in code sheet for service '{svc}')", ""]
 
     if calls:
         L += ["# Execute porting"] + calls
-    return new_code_cell("\n".join(L) + "\n")
+    # trailing "" gives the final newline; `join(L) + "\n"` would copy the whole (DB-sized) cell twice
+    L.append("")
+    return new_code_cell("\n".join(L))
 
 def build_warnings_cell(issues: Dict[str, Any]):
     msgs=[]
@@ -482,6 +696,16 @@ def _now_pacific() -> Tuple[str, str]:
         dt = datetime.now()
     return dt.strftime("%Y-%m-%d"), dt.strftime("%H:%M:%S")
 
+def _cell(v: Any) -> Dict[str, Any]:
+    # RAW-equivalent userEnteredValue for updateCells
+    if v is None or v == "":
+        return {}
+    if isinstance(v, bool):
+        return {"userEnteredValue": {"boolValue": v}}
+    if isinstance(v, (int, float)):
+        return {"userEnteredValue": {"numberValue": v}}
+    return {"userEnteredValue": {"stringValue": str(v)}}
+
 def upsert_summary_sheet(
     sheets,
     spreadsheet_id: str,
@@ -489,42 +713,45 @@ def upsert_summary_sheet(
     headers: List[str],
     rows: List[List[str]],
     set_row_px: int = 18,
+    meta: Optional[Dict[str, Any]] = None,
 ):
-    meta = sheets.spreadsheets().get(spreadsheetId=spreadsheet_id).execute()
-    existing = {sh["properties"]["title"] for sh in meta.get("sheets", [])}
-    if sheet_name not in existing:
-        sheets.spreadsheets().batchUpdate(
-            spreadsheetId=spreadsheet_id,
-            body={"requests": [{"addSheet": {"properties": {"title": sheet_name}}}]},
-        ).execute()
-        log.info("Created summary sheet tab: %s", sheet_name)
+    # Single batchUpdate: [addSheet with a chosen sheetId | clear values] + write values + row heights
+    meta = meta or get_spreadsheet_meta(sheets, spreadsheet_id)
+    props = [sh["properties"] for sh in meta.get("sheets", [])]
+    sheet_id = next((p["sheetId"] for p in props if p["title"] == sheet_name), None)
+
+    values = [headers] + rows
+    n_rows = len(values)
+    n_cols = max(len(r) for r in values)
+
+    # updateCells (unlike values.update) does not grow the grid: size it up front
+    requests: List[Dict[str, Any]] = []
+    if sheet_id is None:
+        sheet_id = max((p["sheetId"] for p in props), default=0) + 1
+        grid = {"rowCount": max(1000, n_rows), "columnCount": max(26, n_cols)}
+        requests.append({"addSheet": {"properties": {"title": sheet_name, "sheetId": sheet_id, "gridProperties": grid}}})
+        log.info("Creating summary sheet tab: %s", sheet_name)
     else:
-        sheets.spreadsheets().values().clear(
-            spreadsheetId=spreadsheet_id, range=f"'{sheet_name}'"
-        ).execute()
-        log.info("Cleared existing rows in summary sheet tab: %s", sheet_name)
-
-    body = {"range": f"'{sheet_name}'!A1", "majorDimension": "ROWS", "values": [headers] + rows}
-    sheets.spreadsheets().values().update(
-        spreadsheetId=spreadsheet_id,
-        range=f"'{sheet_name}'!A1",
-        valueInputOption="RAW",
-        body=body,
-    ).execute()
-
-    meta = sheets.spreadsheets().get(spreadsheetId=spreadsheet_id).execute()
-    sheet_id = None
-    for sh in meta["sheets"]:
-        if sh["properties"]["title"] == sheet_name:
-            sheet_id = sh["properties"]["sheetId"]; break
-    if sheet_id is not None:
-        row_count = len(rows) + 1
-        requests = [{
-            "updateDimensionProperties": {
-                "range": {"sheetId": sheet_id, "dimension": "ROWS", "startIndex": 0, "endIndex": row_count},
-                "properties": {"pixelSize": set_row_px},
-                "fields": "pixelSize",
-            }
-        }]
-        sheets.spreadsheets().batchUpdate(spreadsheetId=spreadsheet_id, body={"requests": requests}).execute()
-        log.info("Adjusted row heights on summary tab to %dpx for %d rows", set_row_px, row_count)
+        grid = next(p for p in props if p["sheetId"] == sheet_id).get("gridProperties", {})
+        for dim, have, need in (("ROWS", grid.get("rowCount", 0), n_rows), ("COLUMNS", grid.get("columnCount", 0), n_cols)):
+            if have < need:
+                requests.append({"appendDimension": {"sheetId": sheet_id, "dimension": dim, "length": need - have}})
+        requests.append({"updateCells": {"range": {"sheetId": sheet_id}, "fields": "userEnteredValue"}})
+        log.info("Clearing existing rows in summary sheet tab: %s", sheet_name)
+
+    requests.append({
+        "updateCells": {
+            "start": {"sheetId": sheet_id, "rowIndex": 0, "columnIndex": 0},
+            "rows": [{"values": [_cell(v) for v in r]} for r in values],
+            "fields": "userEnteredValue",
+        }
+    })
+    requests.append({
+        "updateDimensionProperties": {
+            "range": {"sheetId": sheet_id, "dimension": "ROWS", "startIndex": 0, "endIndex": n_rows},
+            "properties": {"pixelSize": set_row_px},
+            "fields": "pixelSize",
+        }
+    })
+    execute_with_retries(sheets.spreadsheets().batchUpdate(spreadsheetId=spreadsheet_id, body={"requests": requests}))
+    log.info("Wrote %d rows to summary tab and set row heights to %dpx", n_rows, set_row_px)
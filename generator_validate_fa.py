@@ -1,12 +1,15 @@
 from __future__ import annotations
 from dateutil import parser
-import os, sys, re, json, ast, time, pprint, logging, traceback
+import os, sys, re, json, ast, time, random, pprint, logging, threading, traceback
 from typing import Dict, Any, List, Optional, Tuple
 from datetime import datetime, timezone
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import lru_cache
+from itertools import chain, islice
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait, FIRST_COMPLETED, ALL_COMPLETED
 
 import nbformat
-from nbformat.v4 import new_notebook, new_markdown_cell, new_code_cell
+from nbformat.v4 import new_notebook, writes_json
+from nbformat.corpus.words import generate_corpus_id as random_cell_id
 
 # --- Colab / Google APIs ---
 from google.colab import auth, drive as gdrive_mount  # type: ignore
@@ -14,6 +17,11 @@ from googleapiclient.discovery import build           # type: ignore
 from googleapiclient.http import MediaInMemoryUpload  # type: ignore
 from googleapiclient.errors import HttpError          # type: ignore
 
+try:
+    import orjson  # optional: several times faster than stdlib json on large initial-DB blobs
+except ImportError:
+    orjson = None
+
 # =========================
 # Config via environment
 # =========================
@@ -38,7 +46,8 @@ SUMMARY_SHEET_NAME_WORKING_AUTOMATION = os.environ.get(
 ).strip()
 
 WS_OUT_FOLDER_NAME   = os.environ.get("WS_OUT_FOLDER_NAME_FA_VAL", "generated_colabs_ws").strip()
-MAX_WORKERS          = int(os.environ.get("MAX_WORKERS", "6"))
+MAX_WORKERS          = int(os.environ.get("MAX_WORKERS", "6"))                       # upload threads
+BUILD_WORKERS        = int(os.environ.get("BUILD_WORKERS", str(os.cpu_count() or 1)))  # notebook-building processes
 
 # Final-assertion column names (env-controlled)
 FINAL_ASSERTION_COL_NAME = os.environ.get("FINAL_ASSERTION_COL_NAME", "final_assertion_code").strip()
@@ -139,10 +148,28 @@ QUERY_CATEGORY_MAPPING: Dict[str, str] = {
     "NEGATIVE - Visual Grounding + Retrieval/Actions": "NEGATIVEVisualGroundingRetrievalAndActions",
 }
 
+# Notebook-side serializer for the calendar porter's JSON-string input: orjson when the runtime has it,
+# stdlib for no orjson, ints wider than 64 bits, or NaN/Infinity. py_literal renders non-finite floats as
+# float("nan")/float("inf"); orjson would write those as null where json.dumps writes NaN/Infinity.
+_FAST_DUMPS_DEF = """def _fast_dumps(obj):
+    try:
+        import orjson
+        out = orjson.dumps(obj)
+    except (ImportError, TypeError):
+        return json.dumps(obj, ensure_ascii=False)
+    if b"null" in out:  # may be a non-finite float orjson turned into null
+        try:
+            json.dumps(obj, allow_nan=False)
+        except ValueError:
+            return json.dumps(obj, ensure_ascii=False)
+    return out.decode("utf-8")
+"""
+
 API_INITIAL_MODULE_CODE = {
     "calendar": [
         "from Scripts.porting.port_calendar import port_calendar",
-        "port_calendar(json.dumps(port_calender_db, ensure_ascii=False), \"/content/DBs/ported_db_initial_calendar.json\")",
+        _FAST_DUMPS_DEF,
+        "port_calendar(_fast_dumps(port_calender_db), \"/content/DBs/ported_db_initial_calendar.json\")",
         "google_calendar.SimulationEngine.db.load_state(\"/content/DBs/ported_db_initial_calendar.json\")"
     ]
 }
@@ -150,7 +177,8 @@ API_INITIAL_MODULE_CODE = {
 API_FINAL_MODULE_CODE = {
     "calendar": [
         "from Scripts.porting.port_calendar import port_calendar",
-        "port_calendar(json.dumps(port_calender_db, ensure_ascii=False), \"/content/DBs/ported_db_final_calendar.json\")",
+        _FAST_DUMPS_DEF,
+        "port_calendar(_fast_dumps(port_calender_db), \"/content/DBs/ported_db_final_calendar.json\")",
         "google_calendar.SimulationEngine.db.load_state(\"/content/DBs/ported_db_final_calendar.json\")"
     ]
 }
@@ -165,11 +193,7 @@ PORTING_SPECS: Dict[str, Dict[str, Any]] = {
             ("contacts_initial_db", "contacts_src_json",  False),
             ("whatsapp_initial_db", "whatsapp_src_json",  False),
         ],
-        "pre_call_lines": [
-            "port_contact_db = contacts_src_json",
-            "port_whatsapp_db = whatsapp_src_json",
-        ],
-        "call": "port_db_whatsapp_and_contacts(port_contact_db, port_whatsapp_db)",
+        "call": "port_db_whatsapp_and_contacts(contacts_src_json, whatsapp_src_json)",
     },
 
     "calendar": {
@@ -182,8 +206,7 @@ PORTING_SPECS: Dict[str, Dict[str, Any]] = {
     },
     "gmail": {
         "json_vars":   [("gmail_initial_db", "gmail_src_json", False)],
-        "pre_call_lines": ["port_gmail_db_key = gmail_src_json"],
-        "call":        "port_gmail_db(port_gmail_db_key)",
+        "call":        "port_gmail_db(gmail_src_json)",
     },
     "device_settings": {
         "json_vars":   [("device_settings_initial_db", "device_settings_src_json", False)],
@@ -226,11 +249,7 @@ PORTING_SPECS: Dict[str, Dict[str, Any]] = {
             ("contacts_initial_db", "contacts_src_json",  False),
             ("phone_initial_db", "phone_src_json",  False),
         ],
-        "pre_call_lines": [
-            "port_contact_db = contacts_src_json",
-            "port_phone_contacts_db = phone_src_json",
-        ],
-        "call": "port_phone_db(port_phone_contacts_db,port_contact_db)",
+        "call": "port_phone_db(phone_src_json, contacts_src_json)",
     }
 }
 
@@ -298,58 +317,90 @@ def auth_services():
     sheets = build("sheets", "v4")
     return drive, sheets
 
+_thread_local = threading.local()
+
+def thread_drive_service():
+    # googleapiclient/httplib2 clients are not thread-safe: one Drive client per worker thread,
+    # built on its first upload and reused for the rest (building one re-reads the discovery doc)
+    drive = getattr(_thread_local, "drive", None)
+    if drive is None:
+        drive = _thread_local.drive = build("drive", "v3")
+    return drive
+
+_SERVICE_SYNONYMS: Dict[str, str] = {
+    "google calendar": "calendar",
+    "calender": "calendar",
+    "google mail": "gmail",
+    "email": "gmail",
+    "e-mail": "gmail",
+    "media control": "media_control",
+    "device settings": "device_settings",
+    "whatsapp message": "whatsapp",
+    "whatsapp messages": "whatsapp",
+    "message": "whatsapp",
+    "messages": "whatsapp",
+    "reminder": "reminders",
+    "generic reminders": "reminders",
+    "device actions": "device_actions",
+    "notes and lists": "notes",
+    "notes_and_lists": "notes",
+    "media_library": "media_library",
+    "media library": "media_library",
+    "generic_media": "generic_media",
+    "generic media": "generic_media",
+    "home": "google_home",
+    "google home": "google_home",
+    "phone": "phone",
+}
+_RE_SERVICE_SEP = re.compile(r"[/&\s]+")   # separators inside one service token
+_RE_SERVICES_SPLIT = re.compile(r"[|,]")    # separators between tokens in a services cell
+
+# sheet cells mostly hold canonical names already; those return before any regex work
+# (only names the separator pass and the synonym table would leave unchanged, so "home" still maps).
+# Each maps to the spec table's own interned key, so later spec/column lookups match on identity.
+_CANONICAL_SERVICES: Dict[str, str] = {
+    s: s for s in SERVICE_SPECS if _SERVICE_SYNONYMS.get(s, s) == s and not _RE_SERVICE_SEP.search(s)
+}
+
 def normalize_service_token(tok: str) -> str:
-    t = re.sub(r"[/&]", " ", str(tok).strip().lower()); t = re.sub(r"\s+", " ", t)
-    synonyms = {
-        "google calendar": "calendar",
-        "calender": "calendar",
-        "google mail": "gmail",
-        "email": "gmail",
-        "e-mail": "gmail",
-        "media control": "media_control",
-        "device settings": "device_settings",
-        "whatsapp message": "whatsapp",
-        "whatsapp messages": "whatsapp",
-        "message": "whatsapp",
-        "messages": "whatsapp",
-        "reminder": "reminders",
-        "generic reminders": "reminders",
-        "device actions": "device_actions",
-        "notes and lists": "notes",
-        "notes_and_lists": "notes",
-        "media_library": "media_library",
-        "media library": "media_library",
-        "generic_media": "generic_media",
-        "generic media": "generic_media",
-        "home": "google_home",
-        "google home": "google_home",
-        "phone": "phone",
-    }
-    return synonyms.get(t, t)
+    t = str(tok).strip().lower()
+    canon = _CANONICAL_SERVICES.get(t)
+    if canon is not None:
+        return canon
+    t = _RE_SERVICE_SEP.sub(" ", t).strip()
+    return _SERVICE_SYNONYMS.get(t, t)
 
 def split_services(cell: Optional[str]) -> List[str]:
     if not cell: return []
-    tokens = re.split(r"[|,]", cell)
-    out, seen = [], set()
-    for tok in tokens:
-        name = normalize_service_token(tok)
+    names = (normalize_service_token(tok) for tok in _RE_SERVICES_SPLIT.split(cell))
+    return list(dict.fromkeys(n for n in names if n))
+
+# orjson turns integers wider than 64 bits into floats; text with a 19+ digit run goes to stdlib json instead
+_RE_LONG_DIGITS = re.compile(r"\d{19}")
 
-        if name and name not in seen:
-            out.append(name); seen.add(name)
-    return out
+@lru_cache(maxsize=32)
+def parse_json_text(s: str) -> Any:
+    """json.loads semantics at orjson speed. Cached so a row's preflight check and its cell
+    rendering share one parse; the result is shared, callers must not mutate it."""
+    if orjson is not None and not _RE_LONG_DIGITS.search(s):
+        try:
+            return orjson.loads(s)
+        except orjson.JSONDecodeError:
+            pass  # NaN/Infinity, lone surrogates, bad JSON: stdlib accepts or raises its usual message
+    return json.loads(s)
 
 def parse_initial_db(cell_value: Optional[str]) -> Dict[str, Any]:
     if cell_value is None: return {}
     s = str(cell_value).strip()
     if not s or s.lower() in {"nan","none","null"}: return {}
-    return json.loads(s)
+    return parse_json_text(s)
 
 def parse_json_best_effort(cell_value: Optional[str]) -> Dict[str, Any]:
     if cell_value is None: return {}
     s = str(cell_value).strip()
     if not s or s.lower() in {"nan","none","null"}: return {}
     try:
-        return json.loads(s)
+        return parse_json_text(s)
     except Exception:
         pass
     try:
@@ -360,64 +411,123 @@ def parse_json_best_effort(cell_value: Optional[str]) -> Dict[str, Any]:
         pass
     return {}
 
-def py_literal(obj: Any) -> str:
-    return pprint.pformat(obj, width=100, sort_dicts=False)
+def _json_indented(obj: Any) -> str:
+    if orjson is not None:
+        try:
+            out = orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+        except orjson.JSONEncodeError:
+            out = None
+        # orjson writes NaN/Infinity as null, so a null in the output needs the (C-speed) allow_nan check
+        if out is not None and (b"null" not in out or _all_finite(obj)):
+            return out.decode("utf-8")
+    return json.dumps(obj, ensure_ascii=False, indent=2)
+
+def _all_finite(obj: Any) -> bool:
+    try:
+        json.dumps(obj, allow_nan=False)
+    except ValueError:
+        return False
+    return True
+
+# json.dumps output already is a Python literal except for the bare JSON tokens below. With indent=2 every nested
+# scalar sits after a space and ends its own line, and JSON strings never hold a raw newline, so " tok,\n" and
+# " tok\n" can't occur inside a string value. Plain str.replace per token: a regex pass over a large DB costs
+# more than the orjson dump itself.
+_JSON_TO_PY = {"true": "True", "false": "False", "null": "None",
+               "NaN": 'float("nan")', "Infinity": 'float("inf")', "-Infinity": '-float("inf")'}
+_JSON_TOKEN_EDITS = tuple(
+    (tok, ((f" {tok},\n", f" {py},\n"), (f" {tok}\n", f" {py}\n"))) for tok, py in _JSON_TO_PY.items()
+)
 
+def py_literal(obj: Any) -> str:
+    # values come from json.loads; anything json can't express falls back to pprint
+    try:
+        s = _json_indented(obj)
+    except (TypeError, ValueError):
+        return pprint.pformat(obj, width=100, sort_dicts=False)
+    if s in _JSON_TO_PY:  # top-level scalar
+        return _JSON_TO_PY[s]
+    for tok, edits in _JSON_TOKEN_EDITS:
+        if tok in s:
+            for a, b in edits:
+                s = s.replace(a, b)
+    return s
+
+# One token per comment or string literal (triple quotes first); an unterminated literal runs to EOF.
+# Text between tokens is copied by the regex engine untouched.
+_RE_PY_TOKEN = re.compile(r"""
+      \#[^\n]*
+    | (?P<tq>\"\"\"|\'\'\')(?:\\.|.)*?(?:(?P=tq)|\Z)
+    | "(?:\\.?|[^"\\])*(?:"|\Z)
+    | '(?:\\.?|[^'\\])*(?:'|\Z)
+""", re.S | re.X)
+_RE_BARE_NEWLINE = re.compile(r"\\.|\n", re.S)  # escaped pairs are kept verbatim, bare newlines re-escaped
+
+def _reescape_token(m: "re.Match[str]") -> str:
+    tok = m.group(0)
+    if tok[0] == "#" or "\n" not in tok:
+        return tok
+    return _RE_BARE_NEWLINE.sub(lambda e: "\\n" if e.group(0) == "\n" else e.group(0), tok)
+
+@lru_cache(maxsize=256)
 def reescape_newlines_inside_string_literals(src: str) -> str:
+    # live port code, setup/pip cells and assertion code repeat across rows: scan each distinct source once
     if not src: return ""
-    s = src.replace("\r\n","\n").replace("\r","\n")
-    out=[]; i=0; n=len(s); in_str=False; triple=False; quote=''; escape=False; in_comment=False
-    while i<n:
-        ch=s[i]
-        if in_comment:
-            out.append(ch)
-            if ch=="\n": in_comment=False
-            i+=1; continue
-        if in_str:
-            if escape: out.append(ch); escape=False
-            elif ch=="\\": out.append(ch); escape=True
-            elif triple:
-                if ch==quote and i+2<n and s[i+1]==quote and s[i+2]==quote:
-                    out+=[ch,quote,quote]; i+=3; in_str=False; triple=False
-                else:
-                    out.append("\\n" if ch=="\n" else ch); i+=1
-                continue
-            else:
-                if ch=="\n": out.append("\\n")
-                elif ch==quote: out.append(ch); in_str=False
-                else: out.append(ch)
-            i+=1; continue
-        if ch=="#":
-            in_comment=True; out.append(ch); i+=1; continue
-        if ch in ("'",'"'):
-            if i+2<n and s[i+1]==ch and s[i+2]==ch:
-                out+=[ch,ch,ch]; i+=3; in_str=True; triple=True; quote=ch
-            else:
-                out.append(ch); i+=1; in_str=True; triple=False; quote=ch
-            continue
-        out.append(ch); i+=1
-    return "".join(out)
+    # a single `in` scan covers the usual LF-only source; two str.replace beat one r"\r\n?" sub on CRLF text
+    s = src.replace("\r\n","\n").replace("\r","\n") if "\r" in src else src
+    # nothing to rewrite without both a newline and a quote (e.g. pip cells): skip the token scan
+    if "\n" not in s or ('"' not in s and "'" not in s): return s
+    return _RE_PY_TOKEN.sub(_reescape_token, s)
+
+# ---------- Google API calls
+RETRYABLE_HTTP_STATUSES = (429, 500, 502, 503, 504)
+
+def execute_with_retries(request, max_retries: int = 5, base_delay: float = 1.0):
+    """request.execute(), retried with jittered exponential backoff on quota (429) and transient 5xx errors."""
+    attempt = 0
+    while True:
+        try:
+            return request.execute()
+        except HttpError as e:
+            status = getattr(e.resp, "status", None)
+            if status not in RETRYABLE_HTTP_STATUSES or attempt >= max_retries:
+                raise
+            sleep_s = min(base_delay * (2 ** attempt), 32.0) + random.uniform(0, base_delay)
+            log.warning("Google API HTTP %s; retry %d/%d in %.1fs", status, attempt + 1, max_retries, sleep_s)
+            time.sleep(sleep_s)
+            attempt += 1
 
 # ---------- Drive helpers
+# (parent folder id or "root", name) -> folder id; main() reruns in the same Colab session skip the lookups
+_FOLDER_IDS: Dict[Tuple[str, str], str] = {}
+
 def find_root_folder_id(drive, name: str) -> str:
+    key = ("root", name)
+    if key in _FOLDER_IDS: return _FOLDER_IDS[key]
     q = f"name='{name}' and mimeType='application/vnd.google-apps.folder' and 'root' in parents and trashed=false"
-    res = drive.files().list(q=q, fields="files(id,name)").execute().get("files", [])
+    res = execute_with_retries(drive.files().list(q=q, fields="files(id,name)")).get("files", [])
     if not res: raise RuntimeError(f"Folder '{name}' not found in My Drive root.")
+    _FOLDER_IDS[key] = res[0]["id"]
     return res[0]["id"]
 
 def ensure_subfolder(drive, parent_id: str, name: str) -> str:
+    key = (parent_id, name)
+    if key in _FOLDER_IDS: return _FOLDER_IDS[key]
     q = (f"'{parent_id}' in parents and name='{name}' and "
          f"mimeType='application/vnd.google-apps.folder' and trashed=false")
-    res = drive.files().list(q=q, fields="files(id,name)").execute().get("files", [])
-    if res: return res[0]["id"]
-    meta = {"name": name, "mimeType": "application/vnd.google-apps.folder", "parents": [parent_id]}
-    folder = drive.files().create(body=meta, fields="id").execute()
-    return folder["id"]
+    res = execute_with_retries(drive.files().list(q=q, fields="files(id,name)")).get("files", [])
+    if res:
+        folder_id = res[0]["id"]
+    else:
+        meta = {"name": name, "mimeType": "application/vnd.google-apps.folder", "parents": [parent_id]}
+        folder_id = execute_with_retries(drive.files().create(body=meta, fields="id"))["id"]
+    _FOLDER_IDS[key] = folder_id
+    return folder_id
 
 def resolve_output_folder_id(drive, out_hint: str, codebase_folder_name: str) -> str:
     if out_hint:
         try:
-            meta = drive.files().get(fileId=out_hint, fields="id,name,mimeType,trashed").execute()
+            meta = execute_with_retries(drive.files().get(fileId=out_hint, fields="id,name,mimeType,trashed"))
             if meta and meta.get("mimeType") == "application/vnd.google-apps.folder" and not meta.get("trashed", False):
                 log.info("Using provided Drive folder ID: %s (%s)", meta["id"], meta["name"])
                 return meta["id"]
@@ -430,38 +540,83 @@ def resolve_output_folder_id(drive, out_hint: str, codebase_folder_name: str) ->
     base_id = find_root_folder_id(drive, codebase_folder_name)
     return ensure_subfolder(drive, base_id, "generated_colabs_ws")
 
+DRIVE_BATCH_MAX = 100  # calls per Drive batch request
+
+def _batch_delete_files(drive, files: List[Dict[str, str]], max_retries: int = 5, base_delay: float = 1.0) -> int:
+    """Delete files via Drive batch requests (one round-trip per DRIVE_BATCH_MAX deletes);
+    per-file quota/5xx failures are re-batched with the same backoff as execute_with_retries."""
+    by_id = {f["id"]: f for f in files}
+    pending = list(by_id)
+    removed = 0
+    for attempt in range(max_retries + 1):
+        retry: List[str] = []
+
+        def _on_delete(fid, _resp, exc):
+            nonlocal removed
+            f = by_id[fid]
+            if exc is None:
+                removed += 1
+                log.info("  - removed: %s (%s)", f.get("name",""), f.get("mimeType",""))
+            elif (isinstance(exc, HttpError) and attempt < max_retries
+                  and getattr(exc.resp, "status", None) in RETRYABLE_HTTP_STATUSES):
+                retry.append(fid)
+            else:
+                log.warning("  - could not remove %s (%s): %s", f.get("name",""), fid, exc)
+
+        for i in range(0, len(pending), DRIVE_BATCH_MAX):
+            chunk = pending[i:i + DRIVE_BATCH_MAX]
+            batch = drive.new_batch_http_request(callback=_on_delete)
+            for fid in chunk:
+                batch.add(drive.files().delete(fileId=fid), request_id=fid)
+            try:
+                execute_with_retries(batch)
+            except Exception as e:
+                for fid in chunk:
+                    _on_delete(fid, None, e)
+        if not retry:
+            break
+        time.sleep(min(base_delay * (2 ** attempt), 32.0) + random.uniform(0, base_delay))
+        pending = retry
+    return removed
+
 def empty_drive_folder(drive, folder_id: str) -> int:
     log.info("Emptying output folder (id=%s) before generation …", folder_id)
     removed=0; page_token=None
     while True:
-        resp = drive.files().list(
+        resp = execute_with_retries(drive.files().list(
             q=f"'{folder_id}' in parents and trashed=false",
             fields="nextPageToken, files(id, name, mimeType)",
-            pageToken=page_token
-        ).execute()
+            pageToken=page_token, pageSize=DRIVE_BATCH_MAX,
+        ))
         files = resp.get("files", [])
         if not files: break
-        for f in files:
-            fid=f["id"]; fname=f.get("name",""); mt=f.get("mimeType","")
-            try:
-                drive.files().delete(fileId=fid).execute()
-                removed+=1; log.info("  - removed: %s (%s)", fname, mt)
-            except Exception as e:
-                log.warning("  - could not remove %s (%s): %s", fname, fid, e)
+        removed += _batch_delete_files(drive, files)
         page_token = resp.get("nextPageToken")
         if not page_token: break
     log.info("Output folder emptied: %d item(s) removed.", removed)
     return removed
 
+MULTIPART_UPLOAD_MAX_BYTES = 5 * 1024 * 1024  # Drive v3 limit for non-resumable uploads
+
+def notebook_bytes(nb: nbformat.NotebookNode) -> bytes:
+    # No jsonschema validation pass (nbformat.writes() runs one): every notebook here comes
+    # from the new_*_cell builders, so there is nothing for it to catch.
+    if orjson is not None:
+        # same document as writes_json(), with each cell source kept as one string instead of a
+        # list of lines (both are valid v4); the notebook holds only str/int/list/dict values
+        return orjson.dumps(nb, option=orjson.OPT_INDENT_2 | orjson.OPT_SORT_KEYS) + b"\n"
+    return writes_json(nb).encode("utf-8")
+
 def upload_notebook_to_drive_with_retries(folder_id: str, filename: str, nb: nbformat.NotebookNode,
                                           max_retries: int = 5, base_delay: float = 1.0) -> Tuple[str, str]:
     attempt = 0
     last_err: Optional[Exception] = None
+    data = notebook_bytes(nb)  # serialize once; retries resend the same bytes
     while attempt <= max_retries:
         try:
-            drive = build("drive", "v3")  # fresh per thread
-            data = nbformat.writes(nb).encode("utf-8")
-            media = MediaInMemoryUpload(data, mimetype="application/vnd.google.colaboratory", resumable=False)
+            drive = thread_drive_service()
+            media = MediaInMemoryUpload(data, mimetype="application/vnd.google.colaboratory",
+                                        resumable=len(data) > MULTIPART_UPLOAD_MAX_BYTES)
             meta  = {"name": filename, "mimeType": "application/vnd.google.colaboratory", "parents": [folder_id]}
             file  = drive.files().create(body=meta, media_body=media, fields="id,webViewLink").execute()
             file_id = file["id"]
@@ -480,6 +635,7 @@ def upload_notebook_to_drive_with_retries(folder_id: str, filename: str, nb: nbf
             raise
         except Exception as e:
             last_err = e
+            _thread_local.drive = None  # transport failure: rebuild the client on the next attempt
             sleep_s = base_delay * (2 ** attempt) + (0.1 * attempt)
             log.warning("Upload retry %d for %s after error: %s; sleeping %.1fs",
                         attempt + 1, filename, e, sleep_s)
@@ -495,12 +651,14 @@ def upsert_notebook_to_drive(folder_id: str, filename: str, nb: nbformat.Noteboo
     """
     attempt = 0
     last_err: Optional[Exception] = None
+    data = notebook_bytes(nb)  # serialize once; retries resend the same bytes
 
     while attempt <= max_retries:
         try:
-            drive = build("drive", "v3")  # Fresh service object per thread/retry
-            data = nbformat.writes(nb).encode("utf-8")
-            media = MediaInMemoryUpload(data, mimetype="application/vnd.google.colaboratory", resumable=True)
+            drive = thread_drive_service()
+            # multipart is one request; a resumable session costs an extra round-trip and is only needed past 5 MB
+            media = MediaInMemoryUpload(data, mimetype="application/vnd.google.colaboratory",
+                                        resumable=len(data) > MULTIPART_UPLOAD_MAX_BYTES)
 
             # 1. Search for an existing file with the same name in the folder
             q = f"'{folder_id}' in parents and name='{filename}' and trashed=false"
@@ -553,6 +711,7 @@ def upsert_notebook_to_drive(folder_id: str, filename: str, nb: nbformat.Noteboo
             raise  # Re-raise other HTTP errors
         except Exception as e:
             last_err = e
+            _thread_local.drive = None  # transport failure: rebuild the client on the next attempt
             sleep_s = base_delay * (2 ** attempt)
             log.warning(f"Upsert retry {attempt + 1} for {filename} after error: {e}; sleeping {sleep_s:.1f}s")
             time.sleep(sleep_s)
@@ -563,19 +722,45 @@ def upsert_notebook_to_drive(folder_id: str, filename: str, nb: nbformat.Noteboo
     raise RuntimeError("Unknown notebook upsert failure.")
 
 # ---------- Sheets helpers
-def get_first_sheet_title(sheets, spreadsheet_id: str) -> str:
-    meta = sheets.spreadsheets().get(spreadsheetId=spreadsheet_id).execute()
+def get_spreadsheet_meta(sheets, spreadsheet_id: str) -> Dict[str, Any]:
+    # tab properties only (no grid data): enough for titles, ids and existence checks
+    return execute_with_retries(sheets.spreadsheets().get(
+        spreadsheetId=spreadsheet_id, fields="sheets.properties(sheetId,title,gridProperties)"
+    ))
+
+def get_first_sheet_title(sheets, spreadsheet_id: str, meta: Optional[Dict[str, Any]] = None) -> str:
+    meta = meta or get_spreadsheet_meta(sheets, spreadsheet_id)
     return meta["sheets"][0]["properties"]["title"]
 
 def read_sheet_as_dicts(sheets, spreadsheet_id: str, sheet_name: str) -> Tuple[List[str], List[Dict[str, str]]]:
     rng = f"'{sheet_name}'"
-    resp = sheets.spreadsheets().values().get(spreadsheetId=spreadsheet_id, range=rng).execute()
-    values = resp.get("values", [])
+    resp = execute_with_retries(sheets.spreadsheets().values().get(
+        spreadsheetId=spreadsheet_id, range=rng, fields="values"
+    ))
+    return _values_to_dicts(resp.get("values", []))
+
+def read_sheets_as_dicts(sheets, spreadsheet_id: str, sheet_names: List[str]) -> Dict[str, Tuple[List[str], List[Dict[str, str]]]]:
+    # one values.batchGet round-trip for several tabs
+    resp = execute_with_retries(sheets.spreadsheets().values().batchGet(
+        spreadsheetId=spreadsheet_id, ranges=[f"'{n}'" for n in sheet_names], fields="valueRanges(values)"
+    ))
+    value_ranges = resp.get("valueRanges", [])
+    return {
+        name: _values_to_dicts(value_ranges[i].get("values", []) if i < len(value_ranges) else [])
+        for i, name in enumerate(sheet_names)
+    }
+
+def _values_to_dicts(values: List[List[str]]) -> Tuple[List[str], List[Dict[str, str]]]:
     if not values: return [], []
-    headers = [h.strip() for h in values[0]]
+    # interned so lookups by the (compiler-interned) column literals match on identity
+    headers = [sys.intern(h.strip()) for h in values[0]]
+    # Sheets drops trailing empty cells: start each row from an all-blank copy and overlay
+    # the cells it has (zip stops at the shorter side, so extra cells are ignored)
+    blank = dict.fromkeys(headers, "")
     rows: List[Dict[str, str]] = []
     for r in values[1:]:
-        row_dict = {headers[i]: (r[i] if i < len(r) else "") for i in range(len(headers))}
+        row_dict = blank.copy()
+        row_dict.update(zip(headers, r))
         rows.append(row_dict)
     return headers, rows
 
@@ -596,49 +781,56 @@ def compute_initial_services_from_template_row(template_row: Dict[str, str]) ->
 
     return selected
 
+@lru_cache(maxsize=256)
+def _api_modules(services: Tuple[str, ...]) -> Tuple[str, ...]:
+    return tuple(dict.fromkeys(
+        api
+        for s in services if s in SERVICE_SPECS
+        for api in (SERVICE_SPECS[s]["api"], *(SERVICE_SPECS[req]["api"] for req in SERVICE_SPECS[s].get("requires", [])))
+    ))
+
 def api_modules_for_services(services: List[str]) -> List[str]:
     """Return API modules for the given services + their dependencies, deduped in order."""
-    modules: List[str] = []
-    for s in services:
-        spec = SERVICE_SPECS.get(s)
-        if not spec: continue
-        api = spec["api"]
-        if api not in modules:
-            modules.append(api)
-        for req in spec.get("requires", []):
-            req_api = SERVICE_SPECS[req]["api"]
-            if req_api not in modules:
-                modules.append(req_api)
-    return modules
+    return list(_api_modules(tuple(services)))
 
 # ---------- Code sheet readers
-def _find_header(headers: List[str], candidates: List[str]) -> Optional[str]:
-    hnorm = [h.strip().lower() for h in headers]
+def _header_map(headers: List[str]) -> Dict[str, str]:
+    # normalized -> original, in sheet order; the first of two same-named headers wins, as before
+    hmap: Dict[str, str] = {}
+    for h in headers:
+        hmap.setdefault(h.strip().lower(), h)
+    return hmap
+
+def _find_header(hmap: Dict[str, str], candidates: List[str]) -> Optional[str]:
     for cand in candidates:
-        cand_l = cand.strip().lower()
-        for i, h in enumerate(hnorm):
-            if h == cand_l:
-                return headers[i]
+        h = hmap.get(cand.strip().lower())
+        if h is not None:
+            return h
     for cand in candidates:
         cand_l = cand.strip().lower()
-        for i, h in enumerate(hnorm):
-            if cand_l in h:
-                return headers[i]
+        for k, h in hmap.items():
+            if cand_l in k:
+                return h
     return None
 
+_DATE_FORMATS = (
+    "%Y-%m-%d","%Y/%m/%d","%d-%m-%Y","%m/%d/%Y","%d/%m/%Y",
+    "%Y-%m-%d %H:%M:%S","%Y/%m/%d %H:%M:%S","%m/%d/%Y %H:%M:%S","%d/%m/%Y %H:%M:%S",
+    "%b %d, %Y","%d %b %Y","%b %d %Y","%Y.%m.%d",
+)
+
+@lru_cache(maxsize=1024)
 def _parse_any_date(s: str) -> Optional[datetime]:
     if not s: return None
     s = s.strip()
-    fmts = [
-        "%Y-%m-%d","%Y/%m/%d","%d-%m-%Y","%m/%d/%Y","%d/%m/%Y",
-        "%Y-%m-%d %H:%M:%S","%Y/%m/%d %H:%M:%S","%m/%d/%Y %H:%M:%S","%d/%m/%Y %H:%M:%S",
-        "%b %d, %Y","%d %b %Y","%b %d %Y","%Y.%m.%d",
-    ]
-    for fmt in fmts:
-        try: return datetime.strptime(s, fmt)
-        except Exception: pass
+    # ISO text (the usual sheet value) parses in C without the strptime/exception walk; no format
+    # above accepts a string fromisoformat also accepts with a different result, so order is safe
     try: return datetime.fromisoformat(s.replace("Z","+00:00"))
-    except Exception: return None
+    except ValueError: pass
+    for fmt in _DATE_FORMATS:
+        try: return datetime.strptime(s, fmt)
+        except ValueError: pass
+    return None
 
 def build_service_code_map_with_logs(
     sheets,
@@ -647,18 +839,21 @@ def build_service_code_map_with_logs(
     code_col_candidates: List[str],
     date_col_candidates: List[str] = None,
     resp_col_candidates: List[str] = None,
+    table: Optional[Tuple[List[str], List[Dict[str, str]]]] = None,
 ) -> Tuple[Dict[str, str], Dict[str, Tuple[str, str]]]:
-    headers, rows = read_sheet_as_dicts(sheets, spreadsheet_id, code_sheet_name)
+    # table: (headers, rows) already fetched by the caller; main() reads the code sheet once for both stages
+    headers, rows = table if table is not None else read_sheet_as_dicts(sheets, spreadsheet_id, code_sheet_name)
     if not rows:
         raise RuntimeError(f"No rows found in code sheet '{code_sheet_name}'.")
-    svc_col  = _find_header(headers, ["service_name","service","api","services"])
-    code_col = _find_header(headers, code_col_candidates or ["function_to_translate_json"])
+    hmap = _header_map(headers)
+    svc_col  = _find_header(hmap, ["service_name","service","api","services"])
+    code_col = _find_header(hmap, code_col_candidates or ["function_to_translate_json"])
     if not svc_col or not code_col:
         raise RuntimeError(f"Missing service/code columns in code sheet '{code_sheet_name}'.")
-    date_col = _find_header(headers, (date_col_candidates or
-                                      ["translate_jsons(date_updated)","date_updated","last_updated","updated_at","modified_at","date"]))
-    resp_col = _find_header(headers, (resp_col_candidates or
-                                      ["responsible person","responsible","owner","author","updated_by"]))
+    date_col = _find_header(hmap, (date_col_candidates or
+                                   ["translate_jsons(date_updated)","date_updated","last_updated","updated_at","modified_at","date"]))
+    resp_col = _find_header(hmap, (resp_col_candidates or
+                                   ["responsible person","responsible","owner","author","updated_by"]))
 
     grouped: Dict[str, List[Dict[str, str]]] = {}
     for r in rows:
@@ -670,14 +865,11 @@ def build_service_code_map_with_logs(
     code_map: Dict[str, str] = {}
     meta_map: Dict[str, Tuple[str, str]] = {}
     for svc, items in grouped.items():
-        best_idx = -1; best_dt: Optional[datetime] = None
-        for i, it in enumerate(items):
-            dt_str = (it.get(date_col) if date_col else "") or ""
-            dt = _parse_any_date(dt_str) if dt_str else None
-            if best_dt is None or (dt and dt > best_dt):
-                best_dt = dt; best_idx = i
-        chosen = items[best_idx] if best_idx >= 0 else items[0]
-        code_str = chosen.get(code_col, "") or ""
+        # newest parsable date wins (first row on ties); with no parsable date at all, the last row
+        dated = [(dt, it) for it in items if (dt := _parse_any_date((it.get(date_col) or "") if date_col else ""))]
+        chosen = max(dated, key=lambda p: p[0])[1] if dated else items[-1]
+        # stored notebook-ready (re-escaped + stripped) once, instead of per row in the cell builders
+        code_str = reescape_newlines_inside_string_literals(chosen.get(code_col, "") or "").strip()
         if not code_str: continue
         code_map[svc] = code_str
         chosen_date = (chosen.get(date_col) or "N/A") if date_col else "N/A"
@@ -697,50 +889,77 @@ def _now_pacific() -> Tuple[str, str]:
         dt = datetime.now()
     return dt.strftime("%Y-%m-%d"), dt.strftime("%H:%M:%S")
 
-def upsert_summary_sheet_ws(sheets, spreadsheet_id: str, sheet_name: str, rows: List[List[str]]):
-    meta = sheets.spreadsheets().get(spreadsheetId=spreadsheet_id).execute()
-    existing = {sh["properties"]["title"] for sh in meta.get("sheets", [])}
-    if sheet_name not in existing:
-        sheets.spreadsheets().batchUpdate(
-            spreadsheetId=spreadsheet_id,
-            body={"requests": [{"addSheet": {"properties": {"title": sheet_name}}}]},
-        ).execute()
-        log.info("Created summary sheet tab: %s", sheet_name)
-    else:
-        sheets.spreadsheets().values().clear(
-            spreadsheetId=spreadsheet_id, range=f"'{sheet_name}'"
-        ).execute()
-        log.info("Cleared existing rows in summary sheet tab: %s", sheet_name)
+def _cell(v: Any) -> Dict[str, Any]:
+    # RAW-equivalent userEnteredValue for updateCells
+    if v is None or v == "":
+        return {}
+    if isinstance(v, bool):
+        return {"userEnteredValue": {"boolValue": v}}
+    if isinstance(v, (int, float)):
+        return {"userEnteredValue": {"numberValue": v}}
+    return {"userEnteredValue": {"stringValue": str(v)}}
+
+def upsert_summary_sheet_ws(sheets, spreadsheet_id: str, sheet_name: str, rows: List[List[str]],
+                            meta: Optional[Dict[str, Any]] = None):
+    # Single batchUpdate: [addSheet with a chosen sheetId | clear values] + values + row heights.
+    # meta: tab properties main() already fetched; fetched here (one properties-only get) otherwise
+    meta = meta or get_spreadsheet_meta(sheets, spreadsheet_id)
+    props = [sh["properties"] for sh in meta.get("sheets", [])]
+    sheet_id = next((p["sheetId"] for p in props if p["title"] == sheet_name), None)
 
     refresh_date, refresh_time = _now_pacific()
     rows6 = [r + [refresh_date, refresh_time] for r in rows]
 
     headers = ["sample_id", "task_id", "services_required", "colab_url", "refresh_date", "refresh_time"]
-    body = {"range": f"'{sheet_name}'!A1", "majorDimension": "ROWS", "values": [headers] + rows6}
-    sheets.spreadsheets().values().update(
-        spreadsheetId=spreadsheet_id,
-        range=f"'{sheet_name}'!A1",
-        valueInputOption="RAW",
-        body=body,
-    ).execute()
-
-    meta = sheets.spreadsheets().get(spreadsheetId=spreadsheet_id).execute()
-    sheet_id = None
-    for sh in meta["sheets"]:
-        if sh["properties"]["title"] == sheet_name:
-            sheet_id = sh["properties"]["sheetId"]; break
-    if sheet_id is not None:
-        row_count = len(rows6) + 1
-        req = [{
-            "updateDimensionProperties": {
-                "range": {"sheetId": sheet_id, "dimension": "ROWS", "startIndex": 0, "endIndex": row_count},
-                "properties": {"pixelSize": 18},
-                "fields": "pixelSize",
-            }
-        }]
-        sheets.spreadsheets().batchUpdate(spreadsheetId=spreadsheet_id, body={"requests": req}).execute()
+    values = [headers] + rows6
+    n_rows = len(values)
+    n_cols = max(len(r) for r in values)
+
+    # updateCells (unlike values.update) does not grow the grid: size it up front
+    requests: List[Dict[str, Any]] = []
+    if sheet_id is None:
+        sheet_id = max((p["sheetId"] for p in props), default=0) + 1
+        grid = {"rowCount": max(1000, n_rows), "columnCount": max(26, n_cols)}
+        requests.append({"addSheet": {"properties": {"title": sheet_name, "sheetId": sheet_id, "gridProperties": grid}}})
+        log.info("Created summary sheet tab: %s", sheet_name)
+    else:
+        grid = next(p for p in props if p["sheetId"] == sheet_id).get("gridProperties", {})
+        for dim, have, need in (("ROWS", grid.get("rowCount", 0), n_rows), ("COLUMNS", grid.get("columnCount", 0), n_cols)):
+            if have < need:
+                requests.append({"appendDimension": {"sheetId": sheet_id, "dimension": dim, "length": need - have}})
+        requests.append({"updateCells": {"range": {"sheetId": sheet_id}, "fields": "userEnteredValue"}})
+        log.info("Cleared existing rows in summary sheet tab: %s", sheet_name)
+
+    requests.append({
+        "updateCells": {
+            "start": {"sheetId": sheet_id, "rowIndex": 0, "columnIndex": 0},
+            "rows": [{"values": [_cell(v) for v in r]} for r in values],
+            "fields": "userEnteredValue",
+        }
+    })
+    requests.append({
+        "updateDimensionProperties": {
+            "range": {"sheetId": sheet_id, "dimension": "ROWS", "startIndex": 0, "endIndex": n_rows},
+            "properties": {"pixelSize": 18},
+            "fields": "pixelSize",
+        }
+    })
+    execute_with_retries(sheets.spreadsheets().batchUpdate(spreadsheetId=spreadsheet_id, body={"requests": requests}))
 
 # ---------- Notebook builders
+# Same nodes nbformat.v4's new_code_cell/new_markdown_cell build, minus their per-cell jsonschema validation
+# (0.15-0.3 ms a cell, more than the rest of building a notebook). Every source passed here is a str.
+def new_code_cell(source: str = "") -> nbformat.NotebookNode:
+    return nbformat.NotebookNode(
+        id=random_cell_id(), cell_type="code", metadata=nbformat.NotebookNode(),
+        execution_count=None, source=source, outputs=[],
+    )
+
+def new_markdown_cell(source: str = "") -> nbformat.NotebookNode:
+    return nbformat.NotebookNode(id=random_cell_id(), cell_type="markdown", source=source, metadata=nbformat.NotebookNode())
+
+_RE_QUERY_DATE_PREFIX = re.compile(r"^[\*'\s]+")  # leading */quote/space noise on sheet dates
+
 def build_metadata_cell(
     sample_id: str,
     query_text: str,
@@ -752,7 +971,7 @@ def build_metadata_cell(
     # Parse query_date similar to Freezegun logic: validate with dateutil.parser; if invalid, omit.
     dt_value = ""
     if query_date:
-        dt_value = re.sub(r"^[\*'\s]+", "", query_date).strip()
+        dt_value = _RE_QUERY_DATE_PREFIX.sub("", query_date).strip()
     md = [
         f"**Sample ID**: {sample_id}\n\n",
         f"**Query**: {query_text or ''}\n\n",
@@ -792,9 +1011,15 @@ def build_warnings_cell(issues: Dict[str, Any]):
     if issues["json_errors"]:      msgs.append("- JSON parse errors:\n  - " + "\n  - ".join(f"`{k}` → {v}" for k,v in issues["json_errors"].items()))
     return new_markdown_cell("### Warnings detected for this row\n\n" + "\n".join(msgs)) if msgs else None
 
+@lru_cache(maxsize=8)
+def _setup_sources(setup_cell: str, pipinstall_cell: str) -> Tuple[str, str]:
+    # identical on every row: run the re-escape scan once per run, not twice per notebook
+    return (reescape_newlines_inside_string_literals(setup_cell).strip() + "\n",
+            reescape_newlines_inside_string_literals(pipinstall_cell).strip() + "\n")
+
 def build_setup_cells(setup_cell: str, pipinstall_cell: str):
-    setup_src = reescape_newlines_inside_string_literals(setup_cell).strip() + "\n"
-    pip_src   = reescape_newlines_inside_string_literals(pipinstall_cell).strip() + "\n"
+    # cells themselves stay per-notebook (each gets its own id); only their sources are shared
+    setup_src, pip_src = _setup_sources(setup_cell, pipinstall_cell)
     return [
         new_markdown_cell("## Download relevant files"),
         new_code_cell(setup_src),
@@ -810,7 +1035,8 @@ def build_import_and_port_cell_ws(
     meta_map_initial: Dict[str, Tuple[str, str]],
     user_location_value: str,
     query_date: str,
-    public_tools:List[str]
+    public_tools:List[str],
+    parsed: Optional[Dict[str, Any]] = None,   # preflight_row_ws()["parsed"]
 ):
     L: List[str] = []
     L.append("# Imports")
@@ -846,12 +1072,15 @@ def build_import_and_port_cell_ws(
             L += [f"# (No porting spec defined for '{svc}'; skipping)", ""]
             continue
 
-        # Inject inputs — from TEMPLATE row (initial DBs)
+        # Inject inputs — from TEMPLATE row (initial DBs), already parsed by preflight when available
         for col, var, as_dict in spec.get("json_vars", []):
-            try:
-                d = parse_initial_db(template_row.get(col))
-            except Exception:
-                d = {}
+            if parsed is not None and col in parsed:
+                d = parsed[col]
+            else:
+                try:
+                    d = parse_initial_db(template_row.get(col))
+                except Exception:
+                    d = {}
             if as_dict:
                 L += [f"# {var} from Template Colab → {col} (dict)", f"{var} = {py_literal(d)}", ""]
             else:
@@ -862,7 +1091,6 @@ def build_import_and_port_cell_ws(
 
         # Paste live code with meta line (initial)
         elif code_str := code_map_initial.get(svc, ""):
-            code_str = reescape_newlines_inside_string_literals(code_str).strip()
             date_upd, resp = meta_map_initial.get(svc, ("", ""))
             L += [
                 f"# ==== Porting code for service: {svc} (from live sheet: function_to_translate_json) ====",
@@ -870,15 +1098,15 @@ def build_import_and_port_cell_ws(
                 code_str,
                 "",
             ]
-            for ln in spec.get("pre_call_lines", []): L.append(ln)
-            if spec.get("pre_call_lines"): L.append("")
             calls.append(spec["call"])
         else:
             L += [f"# (No initial code found in code sheet for service '{svc}')", ""]
 
     if calls:
         L += ["# Execute initial porting"] + calls
-    return new_code_cell("\n".join(L) + "\n")
+    # trailing "" gives the final newline; `join(L) + "\n"` would copy the whole (DB-sized) cell twice
+    L.append("")
+    return new_code_cell("\n".join(L))
 
 def final_db_col_for_service(svc: str) -> str:
     """Working Sheet FINAL DB column — '<service>_final_db'."""
@@ -915,10 +1143,10 @@ def build_action_final_dbs_cell_ws(
 
     if not final_services:
         L += ["# No final state changes requested for this task.", ""]
-        return new_code_cell("\n".join(L) + "\n")
-    final_services_list = [normalize_service_token(svc_raw) for svc_raw in final_services]
-    for svc_raw in final_services:
-        svc = normalize_service_token(svc_raw)
+        L.append("")
+        return new_code_cell("\n".join(L))
+    # final_services comes from split_services(): already normalized
+    for svc in final_services:
         spec = PORTING_SPECS.get(svc)
         if not spec:
             L += [f"# (No porting spec defined for '{svc}'; skipping)", ""]
@@ -969,7 +1197,6 @@ def build_action_final_dbs_cell_ws(
             continue
         # --- Append FINAL-DB porting function code (if any) ---
         elif code_str := code_map_final.get(svc, ""):
-            code_str = reescape_newlines_inside_string_literals(code_str).strip()
             date_upd, resp = meta_map_final.get(svc, ("", ""))
             L += [
                 f"# ==== Final-DB porting code for service: {svc} (from live sheet: function_to_translate_json_finalDB) ====",
@@ -981,15 +1208,14 @@ def build_action_final_dbs_cell_ws(
             L += [f"# (No final-DB code in code sheet for service '{svc}')", ""]
 
         # Use SAME call as initial stage
-        for ln in spec.get("pre_call_lines", []): L.append(ln)
-        if spec.get("pre_call_lines"): L.append("")
-        if svc == "contacts" and "whatsapp"  in final_services_list:
+        if svc == "contacts" and "whatsapp"  in final_services:
             ...
         else:
             calls.append(spec["call"])
     if calls:
         L += ["# Execute final porting"] + calls
-    return new_code_cell("\n".join(L) + "\n")
+    L.append("")
+    return new_code_cell("\n".join(L))
 
 def build_initial_assertion_comment_cell(
     services_for_code: List[str],
@@ -1013,11 +1239,10 @@ def build_initial_assertion_comment_cell(
     lines.append("#")
     lines.append("# FINAL DB → requested services and availability:")
     if final_services:
-        for raw in final_services:
-            svc = normalize_service_token(raw)
+        for svc in final_services:  # already normalized by split_services()
             col = final_db_col_for_service(svc)
             has_json = bool(str(working_row.get(col, "")).strip())
-            has_code = bool(code_map_final.get(svc, "").strip())
+            has_code = svc in code_map_final  # map holds only non-empty, stripped code
             extra = ""
             if svc == "whatsapp":
                 contacts_final_col = final_db_col_for_service("contacts")
@@ -1058,29 +1283,34 @@ def build_empty_block(title: str):
     return [new_markdown_cell(f"# {title}"), new_code_cell("")]
 
 # ---------- Preflight & notebook generator
+@lru_cache(maxsize=256)
+def _required_cols(expanded_key: frozenset) -> Tuple[str, ...]:
+    """Initial-DB columns the expanded services read, in sorted json_vars order; computed once per service set."""
+    need = sorted({c for s in expanded_key for c in PORTING_SPECS.get(s, {}).get("json_vars", [])})
+    return tuple(c[0] for c in need)
+
 def preflight_row_ws(template_row: Dict[str, str], selected_services: List[str]) -> Dict[str, Any]:
     issues = {"unknown_services": [], "missing_inputs": [], "json_errors": {}}
-    expanded = list(selected_services)
-    for s in selected_services:
-        spec = SERVICE_SPECS.get(s)
-        if spec:
-            for req in spec.get("requires", []):
-                if req not in expanded:
-                    expanded.append(req)
+    expanded = list(dict.fromkeys(chain(
+        selected_services,
+        *(SERVICE_SPECS[s].get("requires", []) for s in selected_services if s in SERVICE_SPECS),
+    )))
     issues["unknown_services"] = [s for s in expanded if s not in SERVICE_SPECS]
 
-    need = sorted({c for s in expanded for c in PORTING_SPECS.get(s, {}).get("json_vars", [])})
-    colnames = [c[0] for c in need]
-    for col in colnames:
-        v = template_row.get(col, "")
-        if not str(v).strip():
+    # validate and keep the parsed value: the port cell renders from `parsed` instead of re-reading the row
+    parsed: Dict[str, Any] = {}
+    for col in _required_cols(frozenset(expanded)):
+        v = str(template_row.get(col, "")).strip()
+        if not v:
             issues["missing_inputs"].append(col)
         else:
             try:
-                json.loads(str(v))
+                d = parse_json_text(v)
             except Exception as e:
                 issues["json_errors"][col] = str(e)
-    return {"expanded": expanded, "issues": issues}
+            else:
+                parsed[col] = {} if d is None else d  # "null" cell: same {} parse_initial_db gives
+    return {"expanded": expanded, "issues": issues, "parsed": parsed}
 
 def _parse_public_tools(public_tools_str: str) -> list[str]:
     """
@@ -1163,7 +1393,8 @@ def generate_notebook_for_row_ws(
             meta_map_initial=meta_map_initial,
             user_location_value=user_loc,
             query_date=query_date,
-            public_tools=public_tools
+            public_tools=public_tools,
+            parsed=pre["parsed"],
         )
     )
 
@@ -1255,36 +1486,50 @@ def add_gemini_keys(L, public_tools):
 
 
 
-# ---------- Parallel worker
-def build_and_upload_worker(
-    idx: int,
-    working_row: Dict[str, str],
-    template_row: Dict[str, str],
+# ---------- Parallel workers
+# Notebook building is pure CPU (process pool); Drive upserts are network-bound (thread pool).
+_RE_UNSAFE_FILENAME_CHARS = re.compile(r"[\\/:*?\"<>|]+")
+_GEN_CTX: Dict[str, Any] = {}
+
+def _init_build_worker(
     setup_cell: str,
     pipinstall_cell: str,
     code_map_initial: Dict[str, str],
     meta_map_initial: Dict[str, Tuple[str, str]],
     code_map_final: Dict[str, str],
     meta_map_final: Dict[str, Tuple[str, str]],
-    out_folder_id: str,
 ):
-    task_id = (working_row.get("task_id") or f"row-{idx}").strip() or f"row-{idx}"
-    try:
-        nb, issues, sample_id = generate_notebook_for_row_ws(
-            working_row, template_row, idx, setup_cell, pipinstall_cell,
-            code_map_initial, meta_map_initial, code_map_final, meta_map_final
-        )
-        safe_name = re.sub(r"[\\/:*?\"<>|]+", "_", sample_id).strip() or f"row-{idx}"
-        fname = f"{safe_name}.ipynb"
-        # _, colab_url = upload_notebook_to_drive_with_retries(out_folder_id, fname, nb)
-        _, colab_url = upsert_notebook_to_drive(out_folder_id, fname, nb)
-        services_required_for_summary = (working_row.get("services_needed") or "").strip()
-        return (idx, sample_id, task_id, services_required_for_summary, colab_url, issues, None)
-    except Exception as e:
-        tb = traceback.format_exc()
-        log.error("Worker failed for task_id=%s: %s\n%s", task_id, e, tb)
-        sample_id = (working_row.get("Sample ID") or f"row-{idx}").strip()
-        return (idx, sample_id, task_id, (working_row.get("services_needed") or "").strip(), "", None, e)
+    # run-wide inputs are shipped to each process once, not pickled with every row
+    _GEN_CTX.update(
+        setup_cell=setup_cell, pipinstall_cell=pipinstall_cell,
+        code_map_initial=code_map_initial, meta_map_initial=meta_map_initial,
+        code_map_final=code_map_final, meta_map_final=meta_map_final,
+    )
+
+def build_notebook_worker(idx: int, working_row: Dict[str, str], template_row: Dict[str, str]):
+    c = _GEN_CTX
+    return generate_notebook_for_row_ws(
+        working_row, template_row, idx, c["setup_cell"], c["pipinstall_cell"],
+        c["code_map_initial"], c["meta_map_initial"], c["code_map_final"], c["meta_map_final"]
+    )
+
+def upload_worker(out_folder_id: str, fname: str, nb: nbformat.NotebookNode) -> str:
+    # _, colab_url = upload_notebook_to_drive_with_retries(out_folder_id, fname, nb)
+    _, colab_url = upsert_notebook_to_drive(out_folder_id, fname, nb)
+    return colab_url
+
+def _log_issues(task_id: str, issues: Dict[str, Any]) -> bool:
+    """Log a row's preflight issues; True when it had any."""
+    if not (issues.get("unknown_services") or issues.get("missing_inputs") or issues.get("json_errors")):
+        return False
+    if issues["unknown_services"]:
+        log.warning("Unknown services for %s: %s", task_id, ", ".join(issues["unknown_services"]))
+    if issues["missing_inputs"]:
+        log.warning("Missing inputs for %s: %s", task_id, ", ".join(issues["missing_inputs"]))
+    if issues["json_errors"]:
+        for col, err_txt in issues["json_errors"].items():
+            log.warning("JSON error in %s for %s: %s", col, task_id, err_txt)
+    return True
 
 # ---------- Main
 def main():
@@ -1303,86 +1548,117 @@ def main():
     log.info("Output notebooks Drive folder id: %s", out_folder_id)
     # empty_drive_folder(drive, out_folder_id)
 
-    ws_name = SOURCE_WORKING_SHEET_NAME or get_first_sheet_title(sheets, SPREADSHEET_ID)
-    log.info("Reading Working Sheet rows from '%s' (spreadsheet id: %s)", ws_name, SPREADSHEET_ID)
-    _, ws_rows = read_sheet_as_dicts(sheets, SPREADSHEET_ID, ws_name)
+    # one properties get serves both the first-tab fallback and the summary upsert
+    meta = None if (SOURCE_WORKING_SHEET_NAME and SOURCE_SHEET_NAME) else get_spreadsheet_meta(sheets, SPREADSHEET_ID)
+    first_title = None if meta is None else get_first_sheet_title(sheets, SPREADSHEET_ID, meta)
+    ws_name = SOURCE_WORKING_SHEET_NAME or first_title
+    templ_name = SOURCE_SHEET_NAME or first_title
+    # both tabs live in SPREADSHEET_ID: one batchGet
+    log.info("Reading Working Sheet rows from '%s' and Template Colab rows from '%s' (spreadsheet id: %s)",
+             ws_name, templ_name, SPREADSHEET_ID)
+    tables = read_sheets_as_dicts(sheets, SPREADSHEET_ID, [ws_name, templ_name])
+    _, ws_rows = tables[ws_name]
     if not ws_rows:
         log.warning("No data found in Working Sheet.")
         return
     log.info("Loaded %d working rows.", len(ws_rows))
 
-    templ_name = SOURCE_SHEET_NAME or get_first_sheet_title(sheets, SPREADSHEET_ID)
-    log.info("Reading Template Colab rows from '%s'", templ_name)
-    _, templ_rows = read_sheet_as_dicts(sheets, SPREADSHEET_ID, templ_name)
+    _, templ_rows = tables[templ_name]
     templ_by_task: Dict[str, Dict[str, str]] = { (r.get("task_id") or "").strip(): r for r in templ_rows if (r.get("task_id") or "").strip() }
 
     code_sheet_id = CODE_SPREADSHEET_ID
-    log.info("Reading INITIAL porting code from '%s' (spreadsheet id: %s)", CODE_SHEET_NAME, code_sheet_id)
+    log.info("Reading porting code from '%s' (spreadsheet id: %s)", CODE_SHEET_NAME, code_sheet_id)
+    code_table = read_sheet_as_dicts(sheets, code_sheet_id, CODE_SHEET_NAME)
     code_map_initial, meta_map_initial = build_service_code_map_with_logs(
         sheets,
         spreadsheet_id=code_sheet_id,
         code_sheet_name=CODE_SHEET_NAME,
         code_col_candidates=["function_to_translate_json","code","porting_code","port_code"],
+        table=code_table,
     )
     log.info("Prepared INITIAL porting code for %d services.", len(code_map_initial))
 
-    log.info("Reading FINAL-DB porting code from '%s' (spreadsheet id: %s)", CODE_SHEET_NAME, code_sheet_id)
     code_map_final, meta_map_final = build_service_code_map_with_logs(
         sheets,
         spreadsheet_id=code_sheet_id,
         code_sheet_name=CODE_SHEET_NAME,
         code_col_candidates=["function_to_translate_json_finalDB","final_db_code","final_porting_code"],
+        table=code_table,
     )
     log.info("Prepared FINAL-DB porting code for %d services.", len(code_map_final))
 
     start = time.time()
     rows_for_summary: List[Tuple[int, str, str, str, str]] = []
     problems_cnt = 0
-
-    work_items = []
-    for i, wrow in enumerate(ws_rows, start=1):
-        task_id = (wrow.get("task_id") or f"row-{i}").strip() or f"row-{i}"
-        trow = templ_by_task.get(task_id, {})
-        work_items.append((i, wrow, trow))
-
-    log.info("Starting parallel build/upload with %d worker(s)…", MAX_WORKERS)
-    with ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="ws") as ex:
-        futures = [
-            ex.submit(
-                build_and_upload_worker,
-                i, wrow, trow,
-                setup_cell, pipinstall_cell,
-                code_map_initial, meta_map_initial,
-                code_map_final,  meta_map_final,
-                out_folder_id,
-            )
-            for (i, wrow, trow) in work_items
-        ]
-
-        for fut in as_completed(futures):
-            idx, sample_id, task_id, services_required, colab_url, issues, err = fut.result()
-            if err is None:
-                rows_for_summary.append((idx, sample_id, task_id, services_required, colab_url))
-                if issues and (issues.get("unknown_services") or issues.get("missing_inputs") or issues.get("json_errors")):
-                    problems_cnt += 1
-                    if issues["unknown_services"]:
-                        log.warning("Unknown services for %s: %s", task_id, ", ".join(issues["unknown_services"]))
-                    if issues["missing_inputs"]:
-                        log.warning("Missing inputs for %s: %s", task_id, ", ".join(issues["missing_inputs"]))
-                    if issues["json_errors"]:
-                        for col, err_txt in issues["json_errors"].items():
-                            log.warning("JSON error in %s for %s: %s", col, task_id, err_txt)
-                log.info("✔ Uploaded %s (%s) → %s", sample_id, task_id, colab_url)
-            else:
-                problems_cnt += 1
-                rows_for_summary.append((idx, sample_id, task_id, services_required, ""))  # keep row; empty URL on failure
-                log.error("✖ Failed %s / %s (kept in summary with empty URL).", sample_id, task_id)
+    # upload future -> (idx, sample_id, task_id, services_required, had_issues)
+    uploads_pending: Dict[Any, Tuple[int, str, str, str, bool]] = {}
+
+    def _failed(idx: int, sample_id: str, task_id: str, services_required: str):
+        nonlocal problems_cnt
+        problems_cnt += 1
+        rows_for_summary.append((idx, sample_id, task_id, services_required, ""))  # keep row; empty URL on failure
+        log.error("✖ Failed %s / %s (kept in summary with empty URL).", sample_id, task_id)
+
+    def _drain(return_when):
+        nonlocal problems_cnt
+        finished, _ = wait(uploads_pending, return_when=return_when)
+        for fut in finished:
+            idx, sample_id, task_id, services_required, had_issues = uploads_pending.pop(fut)
+            try:
+                colab_url = fut.result()
+            except Exception as e:
+                log.error("Upload failed for task_id=%s: %s\n%s", task_id, e, traceback.format_exc())
+                _failed(idx, sample_id, task_id, services_required)
+                continue
+            if had_issues: problems_cnt += 1
+            rows_for_summary.append((idx, sample_id, task_id, services_required, colab_url))
+            log.info("✔ Uploaded %s (%s) → %s", sample_id, task_id, colab_url)
+
+    log.info("Starting parallel build (%d process(es)) / upload (%d thread(s))…", BUILD_WORKERS, MAX_WORKERS)
+    with ProcessPoolExecutor(
+        max_workers=BUILD_WORKERS,
+        initializer=_init_build_worker,
+        initargs=(setup_cell, pipinstall_cell, code_map_initial, meta_map_initial, code_map_final, meta_map_final),
+    ) as builders, ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="ws") as uploaders:
+        builds: Dict[Any, Tuple[int, Dict[str, str]]] = {}
+        pending_rows = enumerate(ws_rows, start=1)
+
+        def _submit_builds():
+            # top the pool up to 2 rows per build process: finished notebooks wait in this process
+            # until consumed, so queueing every row up front piles them up whenever uploads lag
+            for i, wrow in islice(pending_rows, 2 * BUILD_WORKERS - len(builds)):
+                task_id = (wrow.get("task_id") or f"row-{i}").strip() or f"row-{i}"
+                builds[builders.submit(build_notebook_worker, i, wrow, templ_by_task.get(task_id, {}))] = (i, wrow)
+
+        _submit_builds()
+        while builds:
+            finished, _ = wait(builds, return_when=FIRST_COMPLETED)
+            for fut in finished:
+                idx, wrow = builds.pop(fut)
+                task_id = (wrow.get("task_id") or f"row-{idx}").strip() or f"row-{idx}"
+                services_required = (wrow.get("services_needed") or "").strip()
+                try:
+                    nb, issues, sample_id = fut.result()
+                except Exception as e:
+                    log.error("Build failed for task_id=%s: %s\n%s", task_id, e, traceback.format_exc())
+                    _failed(idx, (wrow.get("Sample ID") or f"row-{idx}").strip(), task_id, services_required)
+                    continue
+                had_issues = _log_issues(task_id, issues)
+                safe_name = _RE_UNSAFE_FILENAME_CHARS.sub("_", sample_id).strip() or f"row-{idx}"
+                fut_up = uploaders.submit(upload_worker, out_folder_id, f"{safe_name}.ipynb", nb)
+                uploads_pending[fut_up] = (idx, sample_id, task_id, services_required, had_issues)
+                # bound the built-but-not-uploaded notebooks held in memory
+                if len(uploads_pending) >= 2 * MAX_WORKERS:
+                    _drain(FIRST_COMPLETED)
+            _submit_builds()
+        if uploads_pending:
+            _drain(ALL_COMPLETED)
 
     rows_for_summary.sort(key=lambda x: x[0])
     rows_final = [[sample_id, task_id, services, url] for _, sample_id, task_id, services, url in rows_for_summary]
 
-    sheets = build("sheets", "v4")
-    upsert_summary_sheet_ws(sheets, SPREADSHEET_ID, SUMMARY_SHEET_NAME_WORKING_AUTOMATION, rows_final)
+    # reuse the main thread's Sheets client from auth_services(); workers only touch Drive
+    upsert_summary_sheet_ws(sheets, SPREADSHEET_ID, SUMMARY_SHEET_NAME_WORKING_AUTOMATION, rows_final, meta=meta)
 
     elapsed = time.time() - start
     log.info("Parallel generation complete in %.1fs with %d problem row(s).", elapsed, problems_cnt)